@@ -42,32 +42,37 @@ class ABTestingAgent:
         
         return groups
     
-    def track_metric(self, campaign_id: str, variant: str, metric: str, value: float):
-        """
-        Track a performance metric for a variant.
-        
-        Args:
-            campaign_id: Unique campaign identifier
-            variant: Variant label (A, B, or C)
-            metric: Metric name (open_rate, click_rate, conversion_rate)
-            value: Metric value
-        """
-        if campaign_id not in self.test_results:
-            self.test_results[campaign_id] = {
+    def _variant_data(self, campaign_id: str, variant: str) -> Dict[str, Any]:
+        """Return the counters dict for a variant, creating campaign/variant entries on first use."""
+        campaign = self.test_results.get(campaign_id)
+        if campaign is None:
+            campaign = self.test_results[campaign_id] = {
                 "variants": {},
                 "start_time": datetime.now().isoformat()
             }
         
-        if variant not in self.test_results[campaign_id]["variants"]:
-            self.test_results[campaign_id]["variants"][variant] = {
+        data = campaign["variants"].get(variant)
+        if data is None:
+            data = campaign["variants"][variant] = {
                 "metrics": {},
                 "sent": 0,
                 "opened": 0,
                 "clicked": 0,
                 "converted": 0
             }
+        return data
+    
+    def track_metric(self, campaign_id: str, variant: str, metric: str, value: float):
+        """
+        Track a performance metric for a variant.
         
-        self.test_results[campaign_id]["variants"][variant]["metrics"][metric] = value
+        Args:
+            campaign_id: Unique campaign identifier
+            variant: Variant label (A, B, or C)
+            metric: Metric name (open_rate, click_rate, conversion_rate)
+            value: Metric value
+        """
+        self._variant_data(campaign_id, variant)["metrics"][metric] = value
     
     def record_event(self, campaign_id: str, variant: str, event: str, count: int = 1):
         """
@@ -79,23 +84,9 @@ class ABTestingAgent:
             event: Event type (sent, opened, clicked, converted)
             count: Number of events
         """
-        if campaign_id not in self.test_results:
-            self.test_results[campaign_id] = {
-                "variants": {},
-                "start_time": datetime.now().isoformat()
-            }
-        
-        if variant not in self.test_results[campaign_id]["variants"]:
-            self.test_results[campaign_id]["variants"][variant] = {
-                "metrics": {},
-                "sent": 0,
-                "opened": 0,
-                "clicked": 0,
-                "converted": 0
-            }
-        
-        if event in self.test_results[campaign_id]["variants"][variant]:
-            self.test_results[campaign_id]["variants"][variant][event] += count
+        data = self._variant_data(campaign_id, variant)
+        if event in data:
+            data[event] += count
     
     def calculate_metrics(self, campaign_id: str) -> Dict[str, Any]:
         """
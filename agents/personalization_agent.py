@@ -2,8 +2,25 @@
 from typing import Dict, List, Any
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
 import json
 
+# Static system prompt shared by every variant call. Per-call inputs (strategy,
+# recipient, style) go in the trailing user message so the provider's prompt
+# prefix cache can be reused across variants.
+SYSTEM_PROMPT = """You are an expert email copywriter specializing in personalized, engaging email campaigns.
+
+Create a compelling marketing email that:
+1. Has a catchy, personalized subject line
+2. Includes a personalized greeting
+3. Delivers the key messages from the campaign strategy
+4. Has a clear, compelling call-to-action
+5. Is optimized for email deliverability (not spammy)
+
+Follow the style given in the user message.
+
+Return your response as JSON with: subject, greeting, body, cta, footer"""
+
 class PersonalizationAgent:
     """Agent that generates personalized email content using GenAI."""
     
@@ -13,6 +30,18 @@ class PersonalizationAgent:
             temperature=0.8,
             openai_api_key=api_key
         )
+        self.prompt = ChatPromptTemplate.from_messages([
+            ("system", SYSTEM_PROMPT),
+            ("user", """Campaign Strategy:
+{strategy}
+
+{recipient_context}
+
+Style: {variant_instruction}
+
+Generate a personalized email for variant {variant}.""")
+        ])
+        self.chain = self.prompt | self.llm | StrOutputParser()
     
     def generate_email_content(self, strategy: Dict[str, Any], recipient: Dict[str, str] = None, variant: str = "A", campaign_id: str = None) -> Dict[str, Any]:
         """
@@ -43,29 +72,7 @@ class PersonalizationAgent:
         # SendGrid will automatically track clicks and send webhooks
         tracking_link = "https://yourapp.com/offer"  # Placeholder - SendGrid handles tracking
         
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are an expert email copywriter specializing in personalized, engaging email campaigns.
-            
-            Create a compelling marketing email that:
-            1. Has a catchy, personalized subject line
-            2. Includes a personalized greeting
-            3. Delivers the key messages from the campaign strategy
-            4. Has a clear, compelling call-to-action
-            5. Is optimized for email deliverability (not spammy)
-            
-            Style: {variant_instruction}
-            
-            Return your response as JSON with: subject, greeting, body, cta, footer"""),
-            ("user", """Campaign Strategy:
-{strategy}
-
-{recipient_context}
-
-Generate a personalized email for variant {variant}.""")
-        ])
-        
-        chain = prompt | self.llm
-        response = chain.invoke({
+        content_text = self.chain.invoke({
             "strategy": json.dumps(strategy, indent=2),
             "recipient_context": recipient_context,
             "variant": variant,
@@ -73,8 +80,6 @@ Generate a personalized email for variant {variant}.""")
             "tracking_link": tracking_link
         })
         
-        content_text = response.content
-        
         # Parse response
         try:
             if "```json" in content_text:
@@ -47,7 +47,6 @@ class SegmentationAgent:
     
     def _create_sample_data(self) -> pd.DataFrame:
         """Create sample audience data for testing."""
-        import random
         data = {
             'email': [f'user{i}@example.com' for i in range(1, 101)],
             'name': [f'User {i}' for i in range(1, 101)],
@@ -2,8 +2,23 @@
 from typing import Dict, Any
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
 import json
 
+# Kept constant so repeated strategy calls share a cacheable prompt prefix;
+# the brief is always sent in the trailing user message.
+SYSTEM_PROMPT = """You are an expert email marketing strategist. Analyze the marketing brief and create a comprehensive campaign strategy.
+
+Your strategy should include:
+1. Campaign Objectives - What are the main goals?
+2. Target Audience Profile - Who should receive these emails?
+3. Key Messages - What are the core messages to communicate?
+4. Email Sequence - How many emails and what's the cadence?
+5. Call-to-Actions - What actions should recipients take?
+6. Success Metrics - How will we measure success?
+
+Return your response as a structured JSON with these sections."""
+
 class StrategyAgent:
     """Agent that analyzes marketing brief and creates campaign strategy."""
     
@@ -13,6 +28,11 @@ class StrategyAgent:
             temperature=0.7,
             openai_api_key=api_key
         )
+        self.prompt = ChatPromptTemplate.from_messages([
+            ("system", SYSTEM_PROMPT),
+            ("user", "Marketing Brief:\n{brief}")
+        ])
+        self.chain = self.prompt | self.llm | StrOutputParser()
     
     def create_strategy(self, brief: str) -> Dict[str, Any]:
         """
@@ -24,26 +44,8 @@ class StrategyAgent:
         Returns:
             Dictionary containing campaign strategy
         """
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are an expert email marketing strategist. Analyze the marketing brief and create a comprehensive campaign strategy.
-            
-            Your strategy should include:
-            1. Campaign Objectives - What are the main goals?
-            2. Target Audience Profile - Who should receive these emails?
-            3. Key Messages - What are the core messages to communicate?
-            4. Email Sequence - How many emails and what's the cadence?
-            5. Call-to-Actions - What actions should recipients take?
-            6. Success Metrics - How will we measure success?
-            
-            Return your response as a structured JSON with these sections."""),
-            ("user", "Marketing Brief:\n{brief}")
-        ])
-        
-        chain = prompt | self.llm
-        response = chain.invoke({"brief": brief})
-        
         # Parse the response and structure it
-        strategy_text = response.content
+        strategy_text = self.chain.invoke({"brief": brief})
         
         # Try to extract JSON if present, otherwise structure the text
         try:
@@ -20,12 +20,14 @@ SMTP_USERNAME = os.getenv("SMTP_USERNAME", "")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
 SENDER_EMAIL = os.getenv("SENDER_EMAIL", "")
 SENDER_NAME = os.getenv("SENDER_NAME", "Marketing Campaign System")
+SMTP_MAX_CONNECTIONS = int(os.getenv("SMTP_MAX_CONNECTIONS", "4"))
 
 # SendGrid Configuration
 SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY", "")
 SENDGRID_FROM_EMAIL = os.getenv("SENDGRID_FROM_EMAIL", "")
 SENDGRID_FROM_NAME = os.getenv("SENDGRID_FROM_NAME", SENDER_NAME)
 SENDGRID_SANDBOX = os.getenv("SENDGRID_SANDBOX", "false").lower() in ("1", "true", "yes")
+SENDGRID_REQUESTS_PER_SECOND = float(os.getenv("SENDGRID_REQUESTS_PER_SECOND", "10"))
 USE_SENDGRID = bool(SENDGRID_API_KEY)  # Use SendGrid if API key is provided
 
 # Campaign Configuration
@@ -33,4 +35,12 @@ DATA_DIR = "data"
 RESULTS_DIR = "results"
 MAX_AB_TEST_VARIANTS = 3
 AB_TEST_SPLIT_RATIO = 0.5  # 50/50 split for A/B testing
+TRACKING_SERVER_WORKERS = int(os.getenv("TRACKING_SERVER_WORKERS", "4"))
+# SQLite file holding SendGrid message IDs per campaign variant (shared across workers)
+SENDGRID_MESSAGE_ID_DB = os.getenv("SENDGRID_MESSAGE_ID_DB", os.path.join(DATA_DIR, "message_ids.db"))
+# Celery broker/result backend for background campaign sends (tasks.py)
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
+CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", CELERY_BROKER_URL)
+# Reuse workflow node outputs (results/nodecache) when a node's inputs are unchanged
+ENABLE_NODE_CACHE = os.getenv("ENABLE_NODE_CACHE", "false").lower() in ("1", "true", "yes")
 
@@ -0,0 +1 @@
+"""Pytest configuration: lets tests import the top-level modules (config, utils, ...)."""
@@ -1,9 +1,14 @@
 """Orchestrator using LangGraph to coordinate all agents."""
-from typing import Dict, Any, TypedDict, Annotated
+from typing import Dict, Any, Optional, TypedDict, Annotated
 from langgraph.graph import StateGraph, END
 import operator
 from datetime import datetime
-import uuid
+import hashlib
+import json
+import logging
+import os
+import random
+import secrets
 
 from agents.strategy_agent import StrategyAgent
 from agents.segmentation_agent import SegmentationAgent
@@ -17,6 +22,8 @@ from utils.sendgrid_tracker import SendGridTracker
 from utils.user_activity_tracker import UserActivityTracker
 import config
 
+logger = logging.getLogger(__name__)
+
 class CampaignState(TypedDict):
     """State structure for the campaign orchestration."""
     campaign_id: str
@@ -27,11 +34,16 @@ class CampaignState(TypedDict):
     selected_recipients: list
     email_variants: Dict[str, Any]
     ab_test_groups: Dict[str, list]
-    deliverability_check: Dict[str, Any]
+    deliverability_check: Annotated[Dict[str, Any], operator.or_]
     ab_results: Dict[str, Any]
     campaign_report: Dict[str, Any]
     status: str
     error: str
+    # Per-variant maps merged by reducer so nodes only return their delta
+    sendgrid_message_ids: Annotated[Dict[str, Any], operator.or_]
+    sendgrid_metrics: Annotated[Dict[str, Any], operator.or_]
+    send_results: Annotated[Dict[str, Any], operator.or_]
+    metrics_recorded: list
 
 class CampaignOrchestrator:
     """Orchestrator that coordinates all agents using LangGraph."""
@@ -53,6 +65,8 @@ class CampaignOrchestrator:
                 config.SENDGRID_FROM_EMAIL,
                 config.SENDGRID_FROM_NAME,
                 sandbox=config.SENDGRID_SANDBOX,
+                requests_per_second=config.SENDGRID_REQUESTS_PER_SECOND,
+                message_id_db=config.SENDGRID_MESSAGE_ID_DB,
             )
             self.sendgrid_tracker = SendGridTracker(config.SENDGRID_API_KEY)
             self.use_sendgrid = True
@@ -63,7 +77,8 @@ class CampaignOrchestrator:
                 config.SMTP_USERNAME,
                 config.SMTP_PASSWORD,
                 config.SENDER_EMAIL,
-                config.SENDER_NAME
+                config.SENDER_NAME,
+                max_connections=config.SMTP_MAX_CONNECTIONS
             )
             self.sendgrid_tracker = None
             self.use_sendgrid = False
@@ -93,19 +108,74 @@ class CampaignOrchestrator:
         
         return workflow.compile()
     
-    def _create_strategy(self, state: CampaignState) -> CampaignState:
+    def _node_cache_path(self, node_name: str, inputs: Dict[str, Any]) -> str:
+        """Return the cache file path for a node keyed on a digest of its inputs."""
+        digest = hashlib.sha256(
+            json.dumps(inputs, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+        ).hexdigest()
+        return os.path.join(config.RESULTS_DIR, "nodecache", node_name, f"{digest}.json")
+    
+    def _load_node_cache(self, node_name: str, inputs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Load a cached node update if node caching is enabled and a hit exists.
+        
+        Returns:
+            The cached state update, or None if the node must run
+        """
+        if not config.ENABLE_NODE_CACHE:
+            return None
+        cache_path = self._node_cache_path(node_name, inputs)
+        if not os.path.exists(cache_path):
+            return None
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return None
+    
+    def _save_node_cache(self, node_name: str, inputs: Dict[str, Any], update: Dict[str, Any]):
+        """Persist the state update produced by a node so identical re-runs can skip it."""
+        if not config.ENABLE_NODE_CACHE:
+            return
+        cache_path = self._node_cache_path(node_name, inputs)
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp_path = f"{cache_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(update, f, default=str)
+            os.replace(tmp_path, cache_path)
+        except Exception:
+            # Caching is best-effort; never fail the node because of it
+            pass
+    
+    def _create_strategy(self, state: CampaignState) -> Dict[str, Any]:
         """Create campaign strategy from brief."""
+        cache_inputs = {"brief": state["brief"]}
+        cached = self._load_node_cache("create_strategy", cache_inputs)
+        if cached is not None:
+            return cached
         try:
             strategy_result = self.strategy_agent.create_strategy(state["brief"])
-            state["strategy"] = strategy_result.get("strategy", {})
-            state["status"] = "strategy_created"
+            update = {
+                "strategy": strategy_result.get("strategy", {}),
+                "status": "strategy_created",
+            }
+            self._save_node_cache("create_strategy", cache_inputs, update)
+            return update
         except Exception as e:
-            state["error"] = f"Strategy creation failed: {str(e)}"
-            state["status"] = "error"
-        return state
+            return {"error": f"Strategy creation failed: {str(e)}", "status": "error"}
     
-    def _segment_audience(self, state: CampaignState) -> CampaignState:
+    def _segment_audience(self, state: CampaignState) -> Dict[str, Any]:
         """Segment audience from CSV."""
+        cache_inputs = {
+            "csv_path": state["csv_path"],
+            "csv_mtime_ns": os.stat(state["csv_path"]).st_mtime_ns if os.path.exists(state["csv_path"]) else None,
+            "strategy": state.get("strategy"),
+            "brief": state.get("brief", ""),
+        }
+        cached = self._load_node_cache("segment_audience", cache_inputs)
+        if cached is not None:
+            return cached
         try:
             segmentation_agent = SegmentationAgent(state["csv_path"])
             # Pass campaign brief along with strategy so LLM has proper context
@@ -116,23 +186,32 @@ class CampaignOrchestrator:
             strategy_input["brief"] = state.get("brief", "")
 
             segments = segmentation_agent.segment_audience(strategy_input)
-            state["segments"] = segments
-            state["selected_recipients"] = segments.get("selected_segment", [])
-            state["status"] = "audience_segmented"
+            update = {
+                "segments": segments,
+                "selected_recipients": segments.get("selected_segment", []),
+                "status": "audience_segmented",
+            }
+            self._save_node_cache("segment_audience", cache_inputs, update)
+            return update
         except Exception as e:
-            state["error"] = f"Segmentation failed: {str(e)}"
-            state["status"] = "error"
-        return state
+            return {"error": f"Segmentation failed: {str(e)}", "status": "error"}
     
-    def _generate_content(self, state: CampaignState) -> CampaignState:
+    def _generate_content(self, state: CampaignState) -> Dict[str, Any]:
         """Generate personalized email content for A/B testing."""
+        num_variants = 2  # A and B
+        cache_inputs = {
+            "strategy": state.get("strategy"),
+            "selected_recipients": state.get("selected_recipients"),
+            "num_variants": num_variants,
+        }
+        cached = self._load_node_cache("generate_content", cache_inputs)
+        if cached is not None:
+            return cached
         try:
             recipients = state["selected_recipients"]
-            num_variants = 2  # A and B
             
             # Create A/B test groups
             ab_groups = self.ab_testing_agent.create_test_groups(recipients, num_variants)
-            state["ab_test_groups"] = ab_groups
             
             # Generate content for each variant
             email_variants = {}
@@ -148,15 +227,25 @@ class CampaignOrchestrator:
                 )
                 email_variants[variant] = content
             
-            state["email_variants"] = email_variants
-            state["status"] = "content_generated"
+            update = {
+                "ab_test_groups": ab_groups,
+                "email_variants": email_variants,
+                "status": "content_generated",
+            }
+            self._save_node_cache("generate_content", cache_inputs, update)
+            return update
         except Exception as e:
-            state["error"] = f"Content generation failed: {str(e)}"
-            state["status"] = "error"
-        return state
+            return {"error": f"Content generation failed: {str(e)}", "status": "error"}
     
-    def _check_deliverability(self, state: CampaignState) -> CampaignState:
+    def _check_deliverability(self, state: CampaignState) -> Dict[str, Any]:
         """Check deliverability and compliance."""
+        cache_inputs = {
+            "email_variants": state.get("email_variants"),
+            "ab_test_groups": state.get("ab_test_groups"),
+        }
+        cached = self._load_node_cache("check_deliverability", cache_inputs)
+        if cached is not None:
+            return cached
         try:
             # Check all variants
             all_checks = {}
@@ -167,12 +256,14 @@ class CampaignOrchestrator:
                 )
                 all_checks[variant] = check
             
-            state["deliverability_check"] = all_checks
-            state["status"] = "deliverability_checked"
+            update = {
+                "deliverability_check": all_checks,
+                "status": "deliverability_checked",
+            }
+            self._save_node_cache("check_deliverability", cache_inputs, update)
+            return update
         except Exception as e:
-            state["error"] = f"Deliverability check failed: {str(e)}"
-            state["status"] = "error"
-        return state
+            return {"error": f"Deliverability check failed: {str(e)}", "status": "error"}
     
     def _should_proceed(self, state: CampaignState) -> str:
         """Determine if we should proceed with sending."""
@@ -185,7 +276,74 @@ class CampaignOrchestrator:
         
         return "fix"
     
-    def _run_ab_test(self, state: CampaignState) -> CampaignState:
+    def _harvest_metrics(self, state: Dict[str, Any], variant: str, wait_seconds: int = 5,
+                         log_activity: bool = True) -> Dict[str, Any]:
+        """
+        Record engagement metrics for a sent variant.
+        
+        With SendGrid tracking and message IDs, the latest SendGrid metrics are
+        fetched and replace the ones recorded earlier for the variant (only the
+        difference reaches the A/B counters), so calling again refreshes them
+        instead of double-counting. Otherwise opens/clicks (plus conversions for
+        SMTP) are simulated once per variant; simulated variants are remembered
+        in state["metrics_recorded"].
+        
+        Args:
+            state: Campaign state (mutated in place)
+            variant: Variant to harvest metrics for
+            wait_seconds: Seconds to wait for SendGrid to process emails
+            log_activity: Also log SendGrid opens/clicks to the user activity CSV
+            
+        Returns:
+            Metrics recorded for the variant (empty if nothing new was recorded)
+        """
+        campaign_id = state["campaign_id"]
+        message_ids = state.get("sendgrid_message_ids", {}).get(variant, [])
+        
+        if self.use_sendgrid and self.sendgrid_tracker and message_ids:
+            # Get real metrics from SendGrid
+            metrics = self.sendgrid_tracker.get_campaign_metrics(
+                campaign_id,
+                message_ids,
+                wait_seconds=wait_seconds
+            )
+            sendgrid_metrics = state.setdefault("sendgrid_metrics", {})
+            previous = sendgrid_metrics.get(variant) or {}
+            for event in ("opened", "clicked", "bounced"):
+                self.ab_testing_agent.record_event(
+                    campaign_id, variant, event, metrics.get(event, 0) - previous.get(event, 0)
+                )
+            
+            # Log to user activity CSV
+            if log_activity:
+                self.activity_tracker.log_opens_and_clicks_from_metrics(
+                    campaign_id, variant, state.get("ab_test_groups", {}).get(variant, []), metrics
+                )
+            
+            # Store SendGrid metrics
+            sendgrid_metrics[variant] = metrics
+            return metrics
+        
+        recorded = state.setdefault("metrics_recorded", [])
+        if variant in recorded:
+            return {}
+        
+        # Simulate metrics for SMTP, or for SendGrid when tracking is not available
+        sent = self.ab_testing_agent.test_results.get(campaign_id, {}).get("variants", {}).get(variant, {}).get("sent", 0)
+        opened = int(sent * random.uniform(0.15, 0.35))
+        clicked = int(opened * random.uniform(0.10, 0.25))
+        self.ab_testing_agent.record_event(campaign_id, variant, "opened", opened)
+        self.ab_testing_agent.record_event(campaign_id, variant, "clicked", clicked)
+        metrics = {"opened": opened, "clicked": clicked}
+        if not self.use_sendgrid:
+            converted = int(clicked * random.uniform(0.05, 0.15))
+            self.ab_testing_agent.record_event(campaign_id, variant, "converted", converted)
+            metrics["converted"] = converted
+        
+        recorded.append(variant)
+        return metrics
+    
+    def _run_ab_test(self, state: CampaignState) -> Dict[str, Any]:
         """Run A/B test by sending emails via SendGrid."""
         try:
             campaign_id = state["campaign_id"]
@@ -211,81 +369,50 @@ class CampaignOrchestrator:
                     # Store message IDs for this variant
                     message_ids = [msg["message_id"] for msg in send_results.get("message_ids", [])]
                     sendgrid_message_ids[variant] = message_ids
-                    
-                    # Track sent emails
-                    self.ab_testing_agent.record_event(campaign_id, variant, "sent", send_results["sent"])
-                    
-                    # Get real metrics from SendGrid (wait a bit for processing)
-                    if self.sendgrid_tracker and message_ids:
-                        metrics = self.sendgrid_tracker.get_campaign_metrics(
-                            campaign_id, 
-                            message_ids, 
-                            wait_seconds=3
-                        )
-                        
-                        # Record real SendGrid metrics
-                        self.ab_testing_agent.record_event(campaign_id, variant, "opened", metrics.get("opened", 0))
-                        self.ab_testing_agent.record_event(campaign_id, variant, "clicked", metrics.get("clicked", 0))
-                        self.ab_testing_agent.record_event(campaign_id, variant, "bounced", metrics.get("bounced", 0))
-                        
-                        # Store SendGrid metrics in state
-                        if "sendgrid_metrics" not in state:
-                            state["sendgrid_metrics"] = {}
-                        state["sendgrid_metrics"][variant] = metrics
-                    else:
-                        # Fallback: simulate if SendGrid tracking not available
-                        import random
-                        opened = int(send_results["sent"] * random.uniform(0.15, 0.35))
-                        clicked = int(opened * random.uniform(0.10, 0.25))
-                        self.ab_testing_agent.record_event(campaign_id, variant, "opened", opened)
-                        self.ab_testing_agent.record_event(campaign_id, variant, "clicked", clicked)
                 else:
                     # Use SMTP (fallback)
                     send_results = self.email_sender.send_batch(recipients, content)
-                    self.ab_testing_agent.record_event(campaign_id, variant, "sent", send_results["sent"])
-                    
-                    # Simulate metrics for SMTP
-                    import random
-                    opened = int(send_results["sent"] * random.uniform(0.15, 0.35))
-                    clicked = int(opened * random.uniform(0.10, 0.25))
-                    converted = int(clicked * random.uniform(0.05, 0.15))
-                    
-                    self.ab_testing_agent.record_event(campaign_id, variant, "opened", opened)
-                    self.ab_testing_agent.record_event(campaign_id, variant, "clicked", clicked)
-                    self.ab_testing_agent.record_event(campaign_id, variant, "converted", converted)
+                
+                # Track sent emails
+                self.ab_testing_agent.record_event(campaign_id, variant, "sent", send_results["sent"])
             
-            # Store message IDs in state
-            state["sendgrid_message_ids"] = sendgrid_message_ids
+            # Record engagement metrics (wait a bit for SendGrid processing) on a
+            # working copy so only the resulting delta is handed back to the graph
+            update = {
+                "campaign_id": campaign_id,
+                "ab_test_groups": ab_groups,
+                "sendgrid_message_ids": sendgrid_message_ids,
+                "sendgrid_metrics": {},
+            }
+            # Variants were all sent above, so one processing wait covers every variant
+            for i, variant in enumerate(ab_groups.keys()):
+                self._harvest_metrics(update, variant, wait_seconds=3 if i == 0 else 0, log_activity=False)
+            del update["campaign_id"], update["ab_test_groups"]
             
             # Calculate results
-            ab_results = self.ab_testing_agent.calculate_metrics(campaign_id)
-            state["ab_results"] = ab_results
+            update["ab_results"] = self.ab_testing_agent.calculate_metrics(campaign_id)
             
             # Save results
             self.ab_testing_agent.save_results(campaign_id)
             
-            state["status"] = "ab_test_completed"
+            update["status"] = "ab_test_completed"
+            return update
         except Exception as e:
-            state["error"] = f"A/B test failed: {str(e)}"
-            state["status"] = "error"
-        return state
+            return {"error": f"A/B test failed: {str(e)}", "status": "error"}
     
-    def _send_emails(self, state: CampaignState) -> CampaignState:
+    def _send_emails(self, state: CampaignState) -> Dict[str, Any]:
         """Send winning variant to remaining audience (if applicable)."""
         try:
             campaign_id = state["campaign_id"]
             winner = self.ab_testing_agent.get_winner(campaign_id, "open_rate")
             
             if winner:
-                state["status"] = f"winner_determined: {winner}"
-            else:
-                state["status"] = "emails_sent"
+                return {"status": f"winner_determined: {winner}"}
+            return {"status": "emails_sent"}
         except Exception as e:
-            state["error"] = f"Email sending failed: {str(e)}"
-            state["status"] = "error"
-        return state
+            return {"error": f"Email sending failed: {str(e)}", "status": "error"}
     
-    def _generate_report(self, state: CampaignState) -> CampaignState:
+    def _generate_report(self, state: CampaignState) -> Dict[str, Any]:
         """Generate final campaign report."""
         try:
             campaign_id = state["campaign_id"]
@@ -295,12 +422,9 @@ class CampaignOrchestrator:
                 state["ab_results"],
                 state["deliverability_check"]
             )
-            state["campaign_report"] = report
-            state["status"] = "completed"
+            return {"campaign_report": report, "status": "completed"}
         except Exception as e:
-            state["error"] = f"Report generation failed: {str(e)}"
-            state["status"] = "error"
-        return state
+            return {"error": f"Report generation failed: {str(e)}", "status": "error"}
     
     def run_campaign(self, brief: str, csv_path: str) -> Dict[str, Any]:
         """
@@ -314,7 +438,7 @@ class CampaignOrchestrator:
             Campaign state ready for manual sending
         """
         # Initialize state
-        campaign_id = str(uuid.uuid4())[:8]
+        campaign_id = secrets.token_hex(4)
         initial_state: CampaignState = {
             "campaign_id": campaign_id,
             "brief": brief,
@@ -357,9 +481,6 @@ class CampaignOrchestrator:
         Returns:
             Updated campaign state with send results
         """
-        import logging
-        logger = logging.getLogger(__name__)
-        
         try:
             campaign_id = campaign_state["campaign_id"]
             ab_groups = campaign_state.get("ab_test_groups", {})
@@ -426,31 +547,6 @@ class CampaignOrchestrator:
                     logger.error(f"❌ No emails were sent! Errors: {send_results.get('errors', [])[:3]}")
                     campaign_state["error"] = f"Failed to send emails. Check logs for details. Errors: {send_results.get('errors', [])[:2]}"
                 
-                # Immediately fetch SendGrid metrics for this variant if possible
-                if self.sendgrid_tracker and message_ids:
-                    try:
-                        metrics = self.sendgrid_tracker.get_campaign_metrics(
-                            campaign_id,
-                            message_ids,
-                            wait_seconds=5
-                        )
-                        # Record metrics to A/B testing agent
-                        self.ab_testing_agent.record_event(campaign_id, variant, "opened", metrics.get("opened", 0))
-                        self.ab_testing_agent.record_event(campaign_id, variant, "clicked", metrics.get("clicked", 0))
-                        self.ab_testing_agent.record_event(campaign_id, variant, "bounced", metrics.get("bounced", 0))
-
-                        # Log to user activity CSV
-                        self.activity_tracker.log_opens_and_clicks_from_metrics(
-                            campaign_id, variant, ab_groups[variant], metrics
-                        )
-
-                        # Persist in state
-                        if "sendgrid_metrics" not in campaign_state:
-                            campaign_state["sendgrid_metrics"] = {}
-                        campaign_state["sendgrid_metrics"][variant] = metrics
-                    except Exception as metric_err:
-                        logger.warning(f"⚠️ Failed to fetch SendGrid metrics immediately: {metric_err}")
-                
                 # Mark status for this variant
                 campaign_state["status"] = f"variant_{variant}_sent"
                 campaign_state[f"variant_{variant}_sent"] = True
@@ -470,6 +566,12 @@ class CampaignOrchestrator:
                 campaign_state["status"] = f"variant_{variant}_sent"
                 campaign_state[f"variant_{variant}_sent"] = True
             
+            # Immediately record engagement metrics for this variant if possible
+            try:
+                self._harvest_metrics(campaign_state, variant)
+            except Exception as metric_err:
+                logger.warning(f"⚠️ Failed to fetch SendGrid metrics immediately: {metric_err}")
+            
             # Log any errors but don't fail
             if send_results.get("errors"):
                 logger.warning(f"⚠️ Some emails failed to send: {send_results['errors'][:5]}")  # Log first 5 errors
@@ -504,47 +606,11 @@ class CampaignOrchestrator:
         try:
             campaign_id = campaign_state["campaign_id"]
             ab_groups = campaign_state.get("ab_test_groups", {})
-            email_variants = campaign_state.get("email_variants", {})
-            sendgrid_message_ids = campaign_state.get("sendgrid_message_ids", {})
             
-            # Process metrics for each sent variant
+            # Refresh metrics for each sent variant (SendGrid numbers replace earlier ones)
             for variant in ab_groups.keys():
                 if campaign_state.get(f"variant_{variant}_sent"):
-                    if self.use_sendgrid and self.sendgrid_tracker:
-                        # Get real metrics from SendGrid
-                        message_ids = sendgrid_message_ids.get(variant, [])
-                        if message_ids:
-                            metrics = self.sendgrid_tracker.get_campaign_metrics(
-                                campaign_id, 
-                                message_ids, 
-                                wait_seconds=5
-                            )
-                            
-                            # Record metrics
-                            self.ab_testing_agent.record_event(campaign_id, variant, "opened", metrics.get("opened", 0))
-                            self.ab_testing_agent.record_event(campaign_id, variant, "clicked", metrics.get("clicked", 0))
-                            self.ab_testing_agent.record_event(campaign_id, variant, "bounced", metrics.get("bounced", 0))
-
-                            # Log to user activity CSV
-                            self.activity_tracker.log_opens_and_clicks_from_metrics(
-                                campaign_id, variant, ab_groups[variant], metrics
-                            )
-
-                            # Store SendGrid metrics
-                            if "sendgrid_metrics" not in campaign_state:
-                                campaign_state["sendgrid_metrics"] = {}
-                            campaign_state["sendgrid_metrics"][variant] = metrics
-                    else:
-                        # Simulate metrics for SMTP
-                        import random
-                        sent = self.ab_testing_agent.test_results.get(campaign_id, {}).get("variants", {}).get(variant, {}).get("sent", 0)
-                        opened = int(sent * random.uniform(0.15, 0.35))
-                        clicked = int(opened * random.uniform(0.10, 0.25))
-                        converted = int(clicked * random.uniform(0.05, 0.15))
-                        
-                        self.ab_testing_agent.record_event(campaign_id, variant, "opened", opened)
-                        self.ab_testing_agent.record_event(campaign_id, variant, "clicked", clicked)
-                        self.ab_testing_agent.record_event(campaign_id, variant, "converted", converted)
+                    self._harvest_metrics(campaign_state, variant)
             
             # Calculate A/B test results
             ab_results = self.ab_testing_agent.calculate_metrics(campaign_id)
@@ -3,28 +3,35 @@
 Script to run the email tracking server.
 This server handles click tracking for email campaigns.
 """
-import subprocess
+import argparse
 import sys
-import os
+
+import config
 
 def main():
     """Run the tracking server."""
+    parser = argparse.ArgumentParser(description="Run the email tracking server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--workers", type=int, default=config.TRACKING_SERVER_WORKERS,
+                        help="Number of Uvicorn worker processes")
+    args = parser.parse_args()
+
     print("🚀 Starting Email Tracking Server...")
-    print("📡 Server will be available at: http://localhost:5001")
-    print("🔗 Health check: http://localhost:5001/health")
-    print("📧 Click tracking URLs: http://localhost:5001/track/click/{campaign_id}/{variant}/{email}")
+    print(f"📡 Server will be available at: http://localhost:{args.port}")
+    print(f"🔗 Health check: http://localhost:{args.port}/health")
+    print(f"📧 Click tracking URLs: http://localhost:{args.port}/track/click/{{campaign_id}}/{{variant}}/{{email}}")
     print("Press Ctrl+C to stop the server")
     print("-" * 50)
 
     try:
-        # Run the tracking server
-        subprocess.run([
-            sys.executable,
-            "tracking_server.py"
-        ], check=True)
+        import uvicorn
+
+        # Serve the ASGI app in this process (Uvicorn spawns the workers)
+        uvicorn.run("tracking_server:app", host=args.host, port=args.port, workers=args.workers)
     except KeyboardInterrupt:
         print("\n🛑 Server stopped by user")
-    except subprocess.CalledProcessError as e:
+    except Exception as e:
         print(f"❌ Error running server: {e}")
         sys.exit(1)
 
@@ -3,28 +3,34 @@
 Script to run the SendGrid webhook handler.
 This server receives webhook events from SendGrid for email tracking.
 """
-import subprocess
+import argparse
 import sys
-import os
 
 def main():
     """Run the webhook handler server."""
+    parser = argparse.ArgumentParser(description="Run the SendGrid webhook handler")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5002)
+    parser.add_argument("--threads", type=int, default=16,
+                        help="Number of Waitress worker threads")
+    args = parser.parse_args()
+
     print("🚀 Starting SendGrid Webhook Handler...")
-    print("📡 Server will be available at: http://localhost:5002")
-    print("🔗 Webhook endpoint: http://localhost:5002/webhook/sendgrid")
+    print(f"📡 Server will be available at: http://localhost:{args.port}")
+    print(f"🔗 Webhook endpoint: http://localhost:{args.port}/webhook/sendgrid")
     print("📧 Configure this URL in your SendGrid dashboard")
     print("Press Ctrl+C to stop the server")
     print("-" * 50)
 
     try:
-        # Run the webhook handler
-        subprocess.run([
-            sys.executable,
-            "utils/sendgrid_webhook_handler.py"
-        ], check=True)
+        from waitress import serve
+        from utils.sendgrid_webhook_handler import app
+
+        # Serve the Flask app in this process with a production WSGI server
+        serve(app, host=args.host, port=args.port, threads=args.threads)
     except KeyboardInterrupt:
         print("\n🛑 Server stopped by user")
-    except subprocess.CalledProcessError as e:
+    except Exception as e:
         print(f"❌ Error running server: {e}")
         sys.exit(1)
 
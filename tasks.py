@@ -0,0 +1,99 @@
+"""
+Celery tasks that run SendGrid campaign sends on background workers.
+
+Start a worker with:
+    celery -A tasks worker --loglevel=INFO
+"""
+from typing import Dict, List, Any
+import logging
+
+from celery import Celery, chord
+
+import config
+from utils.sendgrid_sender import SendGridSender, MAX_PERSONALIZATIONS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+celery_app = Celery(
+    "marketing_campaign",
+    broker=config.CELERY_BROKER_URL,
+    backend=config.CELERY_RESULT_BACKEND,
+)
+
+_sender = None
+
+def _get_sender() -> SendGridSender:
+    """One sender per worker process, so its session and rate limiter are reused across tasks."""
+    global _sender
+    if _sender is None:
+        _sender = SendGridSender(
+            config.SENDGRID_API_KEY,
+            config.SENDGRID_FROM_EMAIL,
+            config.SENDGRID_FROM_NAME,
+            sandbox=config.SENDGRID_SANDBOX,
+            requests_per_second=config.SENDGRID_REQUESTS_PER_SECOND,
+            message_id_db=config.SENDGRID_MESSAGE_ID_DB,
+        )
+    return _sender
+
+@celery_app.task(name="tasks.send_chunk")
+def send_chunk(recipients: List[Dict[str, str]], email_content: Dict[str, Any],
+               variant: str, campaign_id: str) -> Dict[str, Any]:
+    """Send one chunk of recipients; 429/5xx retries happen inside the sender."""
+    return _get_sender().send_batch(recipients, email_content, variant, campaign_id)
+
+@celery_app.task(name="tasks.finalize_send")
+def finalize_send(chunk_results: List[Dict[str, Any]], campaign_id: str, variant: str) -> Dict[str, Any]:
+    """
+    Merge per-chunk send_batch results into one result of the same shape.
+
+    Args:
+        chunk_results: send_batch results, in chunk order
+        campaign_id: Campaign identifier
+        variant: A/B test variant
+
+    Returns:
+        Combined send results
+    """
+    merged = {
+        "total": 0,
+        "sent": 0,
+        "failed": 0,
+        "message_ids": [],
+        "errors": [],
+        "per_recipient": [],
+        "sandbox": config.SENDGRID_SANDBOX,
+    }
+    for result in chunk_results:
+        for key in ("total", "sent", "failed"):
+            merged[key] += result.get(key, 0)
+        for key in ("message_ids", "errors", "per_recipient"):
+            merged[key].extend(result.get(key, []))
+    logger.info(f"📊 Background send complete for {campaign_id} variant {variant}: "
+                f"{merged['sent']} sent, {merged['failed']} failed out of {merged['total']} total")
+    return merged
+
+def dispatch_send_batch(recipients: List[Dict[str, str]], email_content: Dict[str, Any],
+                        variant: str = "A", campaign_id: str = ""):
+    """
+    Queue a campaign send and return immediately.
+
+    Recipients are split into chunks of MAX_PERSONALIZATIONS (one SendGrid
+    request each), sent by workers in parallel, and merged by finalize_send.
+
+    Args:
+        recipients: List of recipient dicts with 'email' and optional 'name'
+        email_content: Email content dict with 'subject' and 'body'
+        variant: A/B test variant
+        campaign_id: Campaign identifier
+
+    Returns:
+        Celery AsyncResult whose value is the merged send results
+    """
+    chunks = [
+        recipients[start:start + MAX_PERSONALIZATIONS]
+        for start in range(0, len(recipients), MAX_PERSONALIZATIONS)
+    ] or [[]]
+    header = [send_chunk.s(chunk, email_content, variant, campaign_id) for chunk in chunks]
+    return chord(header)(finalize_send.s(campaign_id, variant))
@@ -0,0 +1,91 @@
+"""Tests for CampaignOrchestrator._harvest_metrics, with SendGrid metrics served by a fake tracker."""
+import pytest
+
+orchestrator = pytest.importorskip("orchestrator")
+
+from agents.ab_testing_agent import ABTestingAgent
+from utils.user_activity_tracker import UserActivityTracker
+
+class FakeSendGridTracker:
+    """Returns queued metrics dicts from get_campaign_metrics, oldest first."""
+
+    def __init__(self, *metrics):
+        self.metrics = list(metrics)
+        self.calls = 0
+
+    def get_campaign_metrics(self, campaign_id, message_ids, wait_seconds=5):
+        self.calls += 1
+        return self.metrics.pop(0)
+
+@pytest.fixture
+def make_orchestrator(tmp_path):
+    trackers = []
+
+    def make(use_sendgrid=True, sendgrid_tracker=None):
+        orch = object.__new__(orchestrator.CampaignOrchestrator)
+        orch.use_sendgrid = use_sendgrid
+        orch.sendgrid_tracker = sendgrid_tracker
+        orch.ab_testing_agent = ABTestingAgent(str(tmp_path / "results"))
+        orch.activity_tracker = UserActivityTracker(str(tmp_path))
+        trackers.append(orch.activity_tracker)
+        orch.ab_testing_agent.record_event("camp1", "A", "sent", 100)
+        return orch
+
+    yield make
+    for tracker in trackers:
+        tracker.close()
+
+def _state(message_ids=None):
+    return {
+        "campaign_id": "camp1",
+        "sendgrid_message_ids": {"A": message_ids} if message_ids else {},
+        "sendgrid_metrics": {},
+        "ab_test_groups": {"A": [{"email": f"user{i}@example.com"} for i in range(10)]},
+    }
+
+def _counts(orch):
+    data = orch.ab_testing_agent.test_results["camp1"]["variants"]["A"]
+    return data["opened"], data["clicked"]
+
+def test_sendgrid_harvest_replaces_earlier_metrics(make_orchestrator):
+    tracker = FakeSendGridTracker(
+        {"opened": 2, "clicked": 1, "bounced": 0},
+        {"opened": 4, "clicked": 2, "bounced": 1},
+    )
+    orch = make_orchestrator(sendgrid_tracker=tracker)
+    state = _state(["msg.0", "msg.1"])
+
+    orch._harvest_metrics(state, "A", wait_seconds=0, log_activity=False)
+    assert _counts(orch) == (2, 1)
+
+    orch._harvest_metrics(state, "A", wait_seconds=0)
+
+    # The second harvest refreshes the numbers instead of adding them again
+    assert _counts(orch) == (4, 2)
+    assert state["sendgrid_metrics"]["A"] == {"opened": 4, "clicked": 2, "bounced": 1}
+    assert tracker.calls == 2
+    # Only the harvest with log_activity set wrote CSV rows
+    assert len([a for a in orch.activity_tracker.get_activities(campaign_id="camp1") if a["action"] == "open"]) == 4
+
+def test_simulated_metrics_are_recorded_once(make_orchestrator):
+    orch = make_orchestrator(use_sendgrid=False)
+    state = _state()
+
+    metrics = orch._harvest_metrics(state, "A")
+    counts = _counts(orch)
+
+    assert set(metrics) == {"opened", "clicked", "converted"}
+    assert counts == (metrics["opened"], metrics["clicked"])
+    assert orch._harvest_metrics(state, "A") == {}
+    assert _counts(orch) == counts
+    assert state["metrics_recorded"] == ["A"]
+
+def test_sendgrid_without_message_ids_falls_back_to_simulation(make_orchestrator):
+    tracker = FakeSendGridTracker()
+    orch = make_orchestrator(sendgrid_tracker=tracker)
+
+    metrics = orch._harvest_metrics(_state(), "A")
+
+    assert set(metrics) == {"opened", "clicked"}
+    assert tracker.calls == 0
+    assert orch.activity_tracker.get_activities() == []
@@ -0,0 +1,74 @@
+"""Tests for SendGridSender.send_batch chunking and per-recipient message IDs, with the HTTP post faked."""
+import pytest
+
+pytest.importorskip("requests")
+
+from utils import sendgrid_sender
+from utils.sendgrid_sender import MAX_PERSONALIZATIONS, SendGridSender
+
+class FakeResponse:
+    def __init__(self, status_code=202, message_id=""):
+        self.status_code = status_code
+        self.headers = {"X-Message-Id": message_id} if message_id else {}
+
+@pytest.fixture
+def sender():
+    sender = SendGridSender("SG.test", "from@example.com", max_workers=1)
+    yield sender
+    sender.message_store.close()
+
+def _recipients(n):
+    return [{"email": f"user{i}@example.com", "name": f"User {i}"} for i in range(n)]
+
+def _fake_post(sender, monkeypatch, responses):
+    """Answer each mail/send with the next response, recording the payloads posted."""
+    payloads = []
+    responses = iter(responses)
+
+    def post_mail(payload):
+        payloads.append(payload)
+        return next(responses)
+
+    monkeypatch.setattr(sender, "_post_mail", post_mail)
+    return payloads
+
+def test_send_batch_splits_recipients_into_personalization_chunks(sender, monkeypatch):
+    payloads = _fake_post(sender, monkeypatch, [FakeResponse(202, "batch1"), FakeResponse(202, "batch2")])
+    recipients = _recipients(MAX_PERSONALIZATIONS + 2)
+
+    results = sender.send_batch(recipients, {"subject": "Hi", "body": "Hello"}, variant="B", campaign_id="camp1")
+
+    assert [len(p["personalizations"]) for p in payloads] == [MAX_PERSONALIZATIONS, 2]
+    first = payloads[0]["personalizations"][0]
+    assert first["to"] == [{"email": "user0@example.com", "name": "User 0"}]
+    assert first["custom_args"] == {"campaign_id": "camp1", "variant": "B", "recipient_email": "user0@example.com"}
+    assert results["sent"] == MAX_PERSONALIZATIONS + 2
+    assert results["failed"] == 0
+    assert [r["email"] for r in results["per_recipient"]] == [r["email"] for r in recipients]
+
+def test_chunk_message_ids_are_derived_from_the_request_id(sender, monkeypatch):
+    _fake_post(sender, monkeypatch, [FakeResponse(202, "batch1"), FakeResponse(202, "batch2")])
+
+    results = sender.send_batch(_recipients(MAX_PERSONALIZATIONS + 2), {"subject": "Hi", "body": "Hello"},
+                                variant="A", campaign_id="camp1")
+
+    ids = [r["message_id"] for r in results["per_recipient"]]
+    assert ids[:2] == ["batch1.0", "batch1.1"]
+    assert ids[MAX_PERSONALIZATIONS - 1] == f"batch1.{MAX_PERSONALIZATIONS - 1}"
+    assert ids[MAX_PERSONALIZATIONS:] == ["batch2.0", "batch2.1"]
+    assert len(set(ids)) == len(ids)
+    assert sorted(sender.get_message_ids("camp1", "A")) == sorted(ids)
+    assert sender.get_message_ids("camp1", "B") == []
+
+def test_chunk_without_message_id_or_with_error_status(sender, monkeypatch):
+    _fake_post(sender, monkeypatch, [FakeResponse(202), FakeResponse(400, "ignored")])
+    monkeypatch.setattr(sendgrid_sender, "MAX_PERSONALIZATIONS", 2)
+
+    results = sender.send_batch(_recipients(4), {"subject": "Hi", "body": "Hello"}, variant="A", campaign_id="camp1")
+
+    rows = results["per_recipient"]
+    assert [(r["success"], r["message_id"]) for r in rows] == [(True, ""), (True, ""), (False, None), (False, None)]
+    assert rows[2]["status_code"] == 400
+    assert (results["sent"], results["failed"]) == (2, 2)
+    assert results["message_ids"] == []
+    assert sender.get_message_ids("camp1", "A") == []
@@ -0,0 +1,75 @@
+"""Tests for the SendGrid webhook endpoint, posting real bodies through Flask's test client."""
+import json
+
+import pytest
+
+pytest.importorskip("flask")
+
+from utils import sendgrid_webhook_handler as handler
+from utils.user_activity_tracker import UserActivityTracker
+
+OPEN_EVENT = {
+    "event": "open",
+    "email": "jane@example.com",
+    "custom_args": {"campaign_id": "camp1", "variant": "A", "recipient_email": "jane@example.com"},
+}
+
+@pytest.fixture
+def tracker(tmp_path, monkeypatch):
+    tracker = UserActivityTracker(str(tmp_path))
+    monkeypatch.setattr(handler, "activity_tracker", tracker)
+    yield tracker
+    tracker.close()
+
+@pytest.fixture
+def client():
+    return handler.app.test_client()
+
+@pytest.mark.parametrize("streaming", [True, False])
+def test_webhook_logs_posted_events(client, tracker, monkeypatch, streaming):
+    if streaming:
+        pytest.importorskip("ijson")
+    monkeypatch.setattr(handler, "IJSON_AVAILABLE", streaming)
+    body = json.dumps([OPEN_EVENT, {"event": "delivered", "email": "bob@example.com"}])
+
+    response = client.post("/webhook/sendgrid", data=body, content_type="application/json")
+
+    assert response.status_code == 200
+    assert response.get_json() == {"status": "success"}
+    activities = tracker.get_activities(campaign_id="camp1")
+    assert [(a["email"], a["action"]) for a in activities] == [("jane@example.com", "open")]
+
+@pytest.mark.parametrize("streaming", [True, False])
+@pytest.mark.parametrize("body", [b"", b"[{", b"not json", b"[]"])
+def test_webhook_rejects_empty_or_malformed_body(client, tracker, monkeypatch, streaming, body):
+    if streaming:
+        pytest.importorskip("ijson")
+    monkeypatch.setattr(handler, "IJSON_AVAILABLE", streaming)
+
+    response = client.post("/webhook/sendgrid", data=body, content_type="application/json")
+
+    assert response.status_code == 400
+    assert tracker.get_activities() == []
+
+def test_webhook_streaming_writes_nothing_when_body_breaks_late(client, tracker, monkeypatch):
+    pytest.importorskip("ijson")
+    monkeypatch.setattr(handler, "IJSON_AVAILABLE", True)
+    # Well past a batch's worth of valid events before the body turns malformed
+    body = json.dumps([OPEN_EVENT] * 600)[:-1] + ', {"event": '
+
+    response = client.post("/webhook/sendgrid", data=body, content_type="application/json")
+
+    assert response.status_code == 400
+    assert tracker.get_activities() == []
+
+@pytest.mark.parametrize("body", [OPEN_EVENT, {}])
+def test_webhook_single_object_matches_buffered_path(client, tracker, monkeypatch, body):
+    pytest.importorskip("ijson")
+    responses = []
+    for streaming in (True, False):
+        monkeypatch.setattr(handler, "IJSON_AVAILABLE", streaming)
+        response = client.post("/webhook/sendgrid", data=json.dumps(body), content_type="application/json")
+        responses.append((response.status_code, response.get_json()))
+
+    assert responses[0] == responses[1]
+    assert tracker.get_activities() == []
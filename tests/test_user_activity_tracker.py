@@ -0,0 +1,86 @@
+"""Tests for UserActivityTracker's CSV log: the campaign offset index, legacy logs and the query cache."""
+import os
+from datetime import datetime
+
+import pytest
+
+from utils.user_activity_tracker import UserActivityTracker
+
+LEGACY_LOG = (
+    "timestamp,campaign_id,variant,email,action,details\r\n"
+    "2024-05-01T10:00:00,camp1,A,jane@example.com,open,\r\n"
+)
+
+@pytest.fixture
+def tracker(tmp_path):
+    with UserActivityTracker(str(tmp_path)) as tracker:
+        yield tracker
+
+def test_campaign_index_returns_only_that_campaigns_rows_in_order(tracker):
+    tracker.log_activity("camp1", "A", "jane@example.com", "open")
+    tracker.log_batch_activities([
+        {"campaign_id": "camp2", "variant": "B", "email": "bob@example.com", "action": "open"},
+        {"campaign_id": "camp1", "variant": "A", "email": "jane@example.com", "action": "click",
+         "details": 'quoted, "multi"\nline details'},
+    ])
+    tracker.log_activity("camp1", "B", "ann@example.com", "open")
+
+    activities = tracker.get_activities(campaign_id="camp1")
+
+    assert [(a["email"], a["action"]) for a in activities] == [
+        ("jane@example.com", "open"), ("jane@example.com", "click"), ("ann@example.com", "open"),
+    ]
+    assert activities[1]["details"] == 'quoted, "multi"\nline details'
+    assert [a["email"] for a in tracker.get_activities(campaign_id="camp2")] == ["bob@example.com"]
+    assert tracker.get_activities(campaign_id="missing") == []
+
+def test_campaign_index_picks_up_rows_appended_by_another_writer(tracker, tmp_path):
+    tracker.log_activity("camp1", "A", "jane@example.com", "open")
+    assert len(tracker.get_activities(campaign_id="camp1")) == 1
+
+    # A second tracker on the same file stands in for another worker process
+    with UserActivityTracker(str(tmp_path)) as other:
+        other.log_activity("camp1", "A", "bob@example.com", "click")
+
+    assert [a["email"] for a in tracker.get_activities(campaign_id="camp1")] == [
+        "jane@example.com", "bob@example.com",
+    ]
+    assert list(tracker.iter_activities(campaign_id="camp1", email="bob@example.com", as_tuple=True))[0][3] == "bob@example.com"
+
+def test_legacy_log_keeps_iso_timestamp_column(tmp_path):
+    with open(os.path.join(tmp_path, "user_activity.csv"), "w", newline="") as f:
+        f.write(LEGACY_LOG)
+
+    with UserActivityTracker(str(tmp_path)) as tracker:
+        tracker.log_activity("camp1", "A", "bob@example.com", "click")
+        tracker.log_batch_activities([
+            {"campaign_id": "camp1", "variant": "A", "email": "ann@example.com", "action": "open"},
+        ])
+
+        for activities in (tracker.get_activities(), tracker.get_activities(campaign_id="camp1")):
+            assert [a["email"] for a in activities] == ["jane@example.com", "bob@example.com", "ann@example.com"]
+            assert all("timestamp" in a and "timestamp_ns" not in a for a in activities)
+            assert activities[0]["timestamp"] == "2024-05-01T10:00:00"
+            # New rows are written in the log's existing ISO format
+            for activity in activities[1:]:
+                datetime.fromisoformat(activity["timestamp"])
+
+def test_new_log_writes_epoch_nanosecond_timestamps(tracker):
+    tracker.log_activity("camp1", "A", "jane@example.com", "open")
+
+    activity, = tracker.get_activities()
+
+    assert int(activity["timestamp_ns"]) > 0
+
+def test_query_cache_is_invalidated_by_appends(tracker):
+    tracker.log_activity("camp1", "A", "jane@example.com", "open")
+    first = tracker.get_activities(email="jane@example.com")
+    # Mutating a returned row must not leak into later answers
+    first[0]["action"] = "edited"
+
+    assert tracker.get_activities(email="jane@example.com")[0]["action"] == "open"
+
+    tracker.log_activity("camp1", "A", "jane@example.com", "click")
+
+    assert [a["action"] for a in tracker.get_activities(email="jane@example.com")] == ["open", "click"]
+    assert [a["action"] for a in tracker.get_activities(campaign_id="camp1", email="jane@example.com")] == ["open", "click"]
@@ -1,23 +1,76 @@
 """
 Tracking Server for Email Click Tracking
-Runs a Flask server to handle click tracking and log activities to CSV.
+Runs a FastAPI app (served by Uvicorn) to handle click tracking and log activities to CSV.
 """
-from flask import Flask, redirect, request
+from contextlib import asynccontextmanager
+from fastapi import BackgroundTasks, FastAPI, Request
+from fastapi.responses import RedirectResponse
 from utils.user_activity_tracker import UserActivityTracker
 import config
 import logging
+import queue
+import threading
+import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
 activity_tracker = UserActivityTracker(config.DATA_DIR)
 
-@app.route('/track/click/<campaign_id>/<variant>/<encoded_email>')
-def track_click(campaign_id, variant, encoded_email):
+# Click records waiting to be appended to the activity CSV in batches
+_LOG_QUEUE: queue.Queue = queue.Queue(maxsize=10_000)
+_LOG_BATCH_SIZE = 256
+_LOG_FLUSH_INTERVAL = 0.5  # seconds
+
+
+def _write_activity_batch(batch):
+    try:
+        activity_tracker.log_batch_activities(batch)
+    except Exception as e:
+        logger.error(f"Error writing {len(batch)} tracked activities: {str(e)}")
+
+
+def _activity_log_flusher():
+    """Drain _LOG_QUEUE, writing every _LOG_BATCH_SIZE records or _LOG_FLUSH_INTERVAL seconds."""
+    buf = []
+    deadline = time.monotonic() + _LOG_FLUSH_INTERVAL
+    while True:
+        try:
+            item = _LOG_QUEUE.get(timeout=max(0.0, deadline - time.monotonic()))
+            if item is None:  # shutdown sentinel
+                break
+            buf.append(item)
+        except queue.Empty:
+            pass
+        now = time.monotonic()
+        if buf and (len(buf) >= _LOG_BATCH_SIZE or now >= deadline):
+            _write_activity_batch(buf)
+            buf = []
+        if now >= deadline:
+            deadline = now + _LOG_FLUSH_INTERVAL
+    if buf:
+        _write_activity_batch(buf)
+
+
+@asynccontextmanager
+async def _lifespan(app):
+    flusher = threading.Thread(target=_activity_log_flusher, name="activity-log-flusher", daemon=True)
+    flusher.start()
+    yield
+    _LOG_QUEUE.put(None)
+    flusher.join(timeout=5)
+
+
+app = FastAPI(title="Email Tracking Server", lifespan=_lifespan)
+
+@app.get('/track/click/{campaign_id}/{variant}/{encoded_email}')
+async def track_click(campaign_id: str, variant: str, encoded_email: str, request: Request, background_tasks: BackgroundTasks):
     """
     Track email clicks and redirect to offer page.
 
+    The click is queued for the batching log flusher so the redirect is
+    returned without waiting on disk I/O.
+
     Args:
         campaign_id: Campaign identifier
         variant: A/B test variant (A, B, etc.)
@@ -27,14 +80,21 @@ def track_click(campaign_id, variant, encoded_email):
         # Decode email
         email = encoded_email.replace('_at_', '@').replace('_dot_', '.')
 
-        # Log the click activity
-        activity_tracker.log_activity(
-            campaign_id=campaign_id,
-            variant=variant,
-            email=email,
-            action='click',
-            details=f'IP: {request.remote_addr}, User-Agent: {request.headers.get("User-Agent", "")}'
-        )
+        # Queue the click activity; the flusher thread appends it to the CSV
+        remote_addr = request.client.host if request.client else ""
+        record = {
+            'timestamp': time.time_ns(),
+            'campaign_id': campaign_id,
+            'variant': variant,
+            'email': email,
+            'action': 'click',
+            'details': f'IP: {remote_addr}, User-Agent: {request.headers.get("user-agent", "")}',
+        }
+        try:
+            _LOG_QUEUE.put_nowait(record)
+        except queue.Full:
+            # Flusher is behind; write this one after the response instead
+            background_tasks.add_task(_write_activity_batch, [record])
 
         logger.info(f"Tracked click: Campaign {campaign_id}, Variant {variant}, Email {email}")
 
@@ -43,22 +103,25 @@ def track_click(campaign_id, variant, encoded_email):
         # For now, redirect to a placeholder offer page
         offer_url = f"https://yourapp.com/offer?campaign={campaign_id}&variant={variant}"
 
-        return redirect(offer_url, code=302)
+        return RedirectResponse(offer_url, status_code=302)
 
     except Exception as e:
         logger.error(f"Error tracking click: {str(e)}")
         # Still redirect even if logging fails
-        return redirect("https://yourapp.com/offer", code=302)
+        return RedirectResponse("https://yourapp.com/offer", status_code=302)
 
-@app.route('/health')
-def health_check():
+@app.get('/health')
+async def health_check():
     """Health check endpoint."""
     return {"status": "healthy", "service": "email-tracking"}
 
 if __name__ == '__main__':
+    import uvicorn
+
     # Run the tracking server
-    app.run(
+    uvicorn.run(
+        "tracking_server:app",
         host='0.0.0.0',
         port=5001,  # Use a different port than Streamlit (which typically uses 8501)
-        debug=False
+        workers=config.TRACKING_SERVER_WORKERS,
     )
@@ -1,9 +1,105 @@
 """Utility functions for loading campaigns and audience data from data folder."""
 import os
-import json
 import pandas as pd
 from typing import Dict, List, Any
 
+from utils import json_utils
+
+def _load_json_briefs(file_path: str) -> List[Dict[str, Any]]:
+    """Load briefs from a JSON file holding one brief object or a list of them."""
+    with open(file_path, 'rb') as f:
+        data = json_utils.loads(f.read())
+    if isinstance(data, dict):
+        if 'name' in data and 'brief' in data:
+            return [data]
+    elif isinstance(data, list):
+        return data
+    return []
+
+def _load_csv_briefs(file_path: str) -> List[Dict[str, Any]]:
+    """Load briefs from a CSV with campaign_name/brief or name/brief columns."""
+    df = pd.read_csv(file_path)
+    # Handle different CSV formats
+    if 'campaign_name' in df.columns and 'brief' in df.columns:
+        # Format: campaign_name, brief
+        records = df.astype(str).to_dict('records')
+        return [{
+            'name': row['campaign_name'],
+            'brief': row['brief'],
+            'campaign_id': row.get('campaign_id', ''),
+            'campaign_type': row.get('campaign_type', ''),
+            'cta': row.get('cta', '')
+        } for row in records]
+    elif 'name' in df.columns and 'brief' in df.columns:
+        # Format: name, brief
+        return df[['name', 'brief']].astype(str).to_dict('records')
+    return []
+
+def _load_txt_brief(file_path: str) -> List[Dict[str, Any]]:
+    """Load a single brief from a TXT file, using the filename as the campaign name."""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        brief = f.read().strip()
+    # Use filename (without extension) as campaign name
+    name = os.path.splitext(os.path.basename(file_path))[0].replace('_', ' ').title()
+    return [{
+        'name': name,
+        'brief': brief
+    }]
+
+# data_dir -> (file signature, campaigns, {name: brief}) from the last scan
+_brief_cache: Dict[str, tuple] = {}
+
+_BRIEF_LOADERS = (
+    ('.json', _load_json_briefs),
+    ('.csv', _load_csv_briefs),
+    ('.txt', _load_txt_brief),
+)
+
+def _scan_campaign_briefs(data_dir: str) -> tuple:
+    """Return the (signature, campaigns, briefs_by_name) cache entry for data_dir, refreshing it if stale."""
+    data_path = os.path.join(data_dir)
+    
+    if not os.path.exists(data_path):
+        return ((), [], {})
+    
+    # Single directory scan, bucketed by extension so JSON, CSV and TXT
+    # briefs are still returned in that order
+    by_ext: Dict[str, List[os.DirEntry]] = {ext: [] for ext, _ in _BRIEF_LOADERS}
+    with os.scandir(data_path) as it:
+        for entry in it:
+            if 'brief' not in entry.name.lower():
+                continue
+            ext = os.path.splitext(entry.name)[1]
+            if ext in by_ext and entry.is_file():
+                by_ext[ext].append(entry)
+    
+    # Reuse the previous result while no brief file was added, removed or modified
+    signature = tuple(
+        (entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+        for ext, _ in _BRIEF_LOADERS for entry in by_ext[ext]
+    )
+    cache_key = os.path.abspath(data_path)
+    cached = _brief_cache.get(cache_key)
+    if cached is not None and cached[0] == signature:
+        return cached
+    
+    campaigns = []
+    for ext, loader in _BRIEF_LOADERS:
+        for entry in by_ext[ext]:
+            try:
+                campaigns.extend(loader(entry.path))
+            except Exception as e:
+                print(f"Error loading {entry.name}: {e}")
+    
+    # First brief wins when several share a name, as with a linear scan
+    by_name: Dict[str, str] = {}
+    for campaign in campaigns:
+        by_name.setdefault(campaign.get('name'), campaign.get('brief', ''))
+    
+    entry = (signature, campaigns, by_name)
+    _brief_cache[cache_key] = entry
+    return entry
+
 def load_campaign_briefs(data_dir: str = "data") -> List[Dict[str, Any]]:
     """
     Load all available campaign briefs from the data folder.
@@ -16,71 +112,8 @@ def load_campaign_briefs(data_dir: str = "data") -> List[Dict[str, Any]]:
     Returns:
         List of dictionaries with 'name' and 'brief' keys
     """
-    campaigns = []
-    data_path = os.path.join(data_dir)
-    
-    if not os.path.exists(data_path):
-        return campaigns
-    
-    # Load from JSON files
-    for file in os.listdir(data_path):
-        if file.endswith('.json') and 'brief' in file.lower():
-            file_path = os.path.join(data_path, file)
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    if isinstance(data, dict):
-                        if 'name' in data and 'brief' in data:
-                            campaigns.append(data)
-                    elif isinstance(data, list):
-                        campaigns.extend(data)
-            except Exception as e:
-                print(f"Error loading {file}: {e}")
-    
-    # Load from CSV files
-    for file in os.listdir(data_path):
-        if file.endswith('.csv') and 'brief' in file.lower():
-            file_path = os.path.join(data_path, file)
-            try:
-                df = pd.read_csv(file_path)
-                # Handle different CSV formats
-                if 'campaign_name' in df.columns and 'brief' in df.columns:
-                    # Format: campaign_name, brief
-                    for _, row in df.iterrows():
-                        campaigns.append({
-                            'name': str(row['campaign_name']),
-                            'brief': str(row['brief']),
-                            'campaign_id': str(row.get('campaign_id', '')),
-                            'campaign_type': str(row.get('campaign_type', '')),
-                            'cta': str(row.get('cta', ''))
-                        })
-                elif 'name' in df.columns and 'brief' in df.columns:
-                    # Format: name, brief
-                    for _, row in df.iterrows():
-                        campaigns.append({
-                            'name': str(row['name']),
-                            'brief': str(row['brief'])
-                        })
-            except Exception as e:
-                print(f"Error loading {file}: {e}")
-    
-    # Load from TXT files
-    for file in os.listdir(data_path):
-        if file.endswith('.txt') and 'brief' in file.lower():
-            file_path = os.path.join(data_path, file)
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    brief = f.read().strip()
-                    # Use filename (without extension) as campaign name
-                    name = os.path.splitext(file)[0].replace('_', ' ').title()
-                    campaigns.append({
-                        'name': name,
-                        'brief': brief
-                    })
-            except Exception as e:
-                print(f"Error loading {file}: {e}")
-    
-    return campaigns
+    # Copies, so callers editing a brief don't change the cached scan
+    return [dict(c) for c in _scan_campaign_briefs(data_dir)[1]]
 
 def get_campaign_brief_by_name(name: str, data_dir: str = "data") -> str:
     """
@@ -93,11 +126,7 @@ def get_campaign_brief_by_name(name: str, data_dir: str = "data") -> str:
     Returns:
         Campaign brief text or empty string if not found
     """
-    campaigns = load_campaign_briefs(data_dir)
-    for campaign in campaigns:
-        if campaign.get('name') == name:
-            return campaign.get('brief', '')
-    return ''
+    return _scan_campaign_briefs(data_dir)[2].get(name, '')
 
 def get_audience_csv_path(data_dir: str = "data") -> str:
     """
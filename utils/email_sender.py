@@ -1,17 +1,28 @@
 """Email sending utility using SMTP."""
 import smtplib
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Tuple
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_HTML_TEMPLATE = """
+            <html>
+              <body>
+                {body}
+              </body>
+            </html>
+            """
+
 class EmailSender:
     """Utility class for sending emails via SMTP."""
     
-    def __init__(self, smtp_server: str, smtp_port: int, username: str, password: str, sender_email: str, sender_name: str):
+    def __init__(self, smtp_server: str, smtp_port: int, username: str, password: str, sender_email: str, sender_name: str,
+                 max_connections: int = 4):
         """
         Initialize email sender with SMTP configuration.
         
@@ -22,6 +33,7 @@ class EmailSender:
             password: SMTP password
             sender_email: Sender email address
             sender_name: Sender display name
+            max_connections: Maximum concurrent SMTP connections used by send_batch
         """
         self.smtp_server = smtp_server
         self.smtp_port = smtp_port
@@ -29,10 +41,41 @@ class EmailSender:
         self.password = password
         self.sender_email = sender_email
         self.sender_name = sender_name
+        self.max_connections = max_connections
+    
+    def _connect(self) -> smtplib.SMTP:
+        """Open an SMTP connection, upgrade it to TLS and authenticate."""
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port)
+        server.ehlo()
+        server.starttls()
+        server.ehlo()
+        server.login(self.username, self.password)
+        return server
+    
+    def _build_parts(self, body: str) -> Tuple[MIMEText, MIMEText]:
+        """Encode the plain and HTML alternatives for a body.
+        
+        The parts are only read when a message is serialized, so one pair can be
+        attached to every message of a batch.
+        """
+        html_body = _HTML_TEMPLATE.format(body=body.replace('\n', '<br>'))
+        return MIMEText(body, 'plain'), MIMEText(html_body, 'html')
+    
+    def _build_message(self, recipient_email: str, subject: str, parts: Tuple[MIMEText, MIMEText]) -> MIMEMultipart:
+        """Build a multipart (plain + HTML) message for a single recipient."""
+        msg = MIMEMultipart('alternative')
+        msg['From'] = f"{self.sender_name} <{self.sender_email}>"
+        msg['To'] = recipient_email
+        msg['Subject'] = subject
+        
+        # Attach parts
+        for part in parts:
+            msg.attach(part)
+        return msg
     
     def send_email(self, recipient_email: str, recipient_name: str, subject: str, body: str) -> bool:
         """
-        Send a single email.
+        Send a single email over its own SMTP connection.
         
         Args:
             recipient_email: Recipient email address
@@ -44,32 +87,8 @@ class EmailSender:
             True if sent successfully, False otherwise
         """
         try:
-            # Create message
-            msg = MIMEMultipart('alternative')
-            msg['From'] = f"{self.sender_name} <{self.sender_email}>"
-            msg['To'] = recipient_email
-            msg['Subject'] = subject
-            
-            # Create HTML version
-            html_body = f"""
-            <html>
-              <body>
-                {body.replace(chr(10), '<br>')}
-              </body>
-            </html>
-            """
-            
-            # Attach parts
-            text_part = MIMEText(body, 'plain')
-            html_part = MIMEText(html_body, 'html')
-            
-            msg.attach(text_part)
-            msg.attach(html_part)
-            
-            # Send email
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.username, self.password)
+            msg = self._build_message(recipient_email, subject, self._build_parts(body))
+            with self._connect() as server:
                 server.send_message(msg)
             
             logger.info(f"Email sent successfully to {recipient_email}")
@@ -79,9 +98,34 @@ class EmailSender:
             logger.error(f"Failed to send email to {recipient_email}: {str(e)}")
             return False
     
+    def _send_with_pool(self, pool: queue.Queue, email: str, subject: str, parts: Tuple[MIMEText, MIMEText]) -> bool:
+        """Send one message on a pooled connection, reconnecting lazily if needed."""
+        server = pool.get()
+        try:
+            msg = self._build_message(email, subject, parts)
+            if server is None:
+                server = self._connect()
+            try:
+                server.send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                # Reconnect lazily and retry this message once
+                server = self._connect()
+                server.send_message(msg)
+            logger.info(f"Email sent successfully to {email}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to send email to {email}: {str(e)}")
+            return False
+        finally:
+            pool.put(server)
+    
     def send_batch(self, recipients: List[Dict[str, str]], email_content: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Send emails to a batch of recipients.
+        Send emails to a batch of recipients over a small pool of SMTP sessions.
+        
+        Up to ``max_connections`` authenticated connections are opened lazily and
+        shared by a thread pool, so sends overlap network round trips. Connections
+        that the server drops are reopened and the message retried once.
         
         Args:
             recipients: List of recipient dictionaries with 'email' and 'name' keys
@@ -97,18 +141,37 @@ class EmailSender:
             "errors": []
         }
         
+        if not recipients:
+            return results
+        
         subject = email_content.get("subject", "No Subject")
         body = email_content.get("full_content", email_content.get("body", ""))
+        emails = [recipient.get("email", "") for recipient in recipients]
+        # Every recipient gets the same body, so encode it once
+        parts = self._build_parts(body)
         
-        for recipient in recipients:
-            email = recipient.get("email", "")
-            name = recipient.get("name", "Customer")
-            
-            if self.send_email(email, name, subject, body):
+        workers = max(1, min(self.max_connections, len(emails)))
+        pool = queue.Queue()
+        for _ in range(workers):
+            pool.put(None)  # connections are opened on first use
+        
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                outcomes = list(executor.map(lambda e: self._send_with_pool(pool, e, subject, parts), emails))
+        finally:
+            while not pool.empty():
+                server = pool.get_nowait()
+                if server is not None:
+                    try:
+                        server.quit()
+                    except Exception:
+                        pass
+        
+        for email, ok in zip(emails, outcomes):
+            if ok:
                 results["sent"] += 1
             else:
                 results["failed"] += 1
                 results["errors"].append(f"Failed to send to {email}")
         
         return results
-
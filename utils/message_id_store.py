@@ -0,0 +1,72 @@
+"""SQLite-backed store of SendGrid message IDs per campaign variant."""
+import os
+import sqlite3
+import threading
+from typing import Dict, List
+
+class MessageIdStore:
+    """Maps (campaign_id, variant, recipient_email) to a SendGrid message ID.
+
+    Backed by SQLite in WAL mode so the IDs survive restarts and several worker
+    processes can share one file. Use ":memory:" for a process-local store.
+    """
+
+    def __init__(self, db_path: str = ":memory:"):
+        """
+        Open (and create if needed) the store.
+
+        Args:
+            db_path: SQLite database path, or ":memory:"
+        """
+        self.db_path = db_path
+        if db_path != ":memory:":
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        # One connection shared across sender threads, serialized by the lock
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            if db_path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS message_ids ("
+                " campaign_id TEXT NOT NULL,"
+                " variant TEXT NOT NULL,"
+                " email TEXT NOT NULL,"
+                " message_id TEXT NOT NULL,"
+                " PRIMARY KEY (campaign_id, variant, email))"
+            )
+
+    def record(self, campaign_id: str, variant: str, ids: Dict[str, str]):
+        """
+        Store message IDs for a campaign variant, replacing earlier IDs per recipient.
+
+        Args:
+            campaign_id: Campaign identifier
+            variant: A/B test variant
+            ids: recipient_email -> message_id
+        """
+        if not ids:
+            return
+        rows = [(campaign_id, variant, email, message_id) for email, message_id in ids.items()]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO message_ids (campaign_id, variant, email, message_id) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+
+    def get(self, campaign_id: str, variant: str) -> List[str]:
+        """Return all message IDs recorded for a campaign variant."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT message_id FROM message_ids WHERE campaign_id = ? AND variant = ?",
+                (campaign_id, variant),
+            )
+            return [row[0] for row in cursor]
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
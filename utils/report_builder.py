@@ -1,10 +1,11 @@
 from __future__ import annotations
 
+import hashlib
 import os
 import json
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 import pandas as pd
 
@@ -12,13 +13,30 @@ import pandas as pd
 try:
     from reportlab.lib.pagesizes import A4
     from reportlab.lib.styles import getSampleStyleSheet
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, LongTable, TableStyle
     from reportlab.lib import colors
     REPORTLAB_AVAILABLE = True
 except Exception:
     REPORTLAB_AVAILABLE = False
 
+if REPORTLAB_AVAILABLE:
+    # Built once and shared by every report render
+    _STYLES = getSampleStyleSheet()
+    _METRIC_TABLE_STYLE = TableStyle([
+        ('BACKGROUND', (0,0), (-1,0), colors.whitesmoke),
+        ('GRID', (0,0), (-1,-1), 0.25, colors.grey),
+        ('FONTNAME', (0,0), (-1,-1), 'Helvetica'),
+        ('ALIGN', (1,0), (1,-1), 'LEFT'),
+    ])
+    _DATA_TABLE_STYLE = TableStyle([
+        ('BACKGROUND', (0,0), (-1,0), colors.whitesmoke),
+        ('GRID', (0,0), (-1,-1), 0.25, colors.grey),
+        ('FONTNAME', (0,0), (-1,-1), 'Helvetica'),
+        ('ALIGN', (1,1), (-1,-1), 'LEFT'),
+    ])
+
 import config
+from utils import json_utils
 
 
 @dataclass
@@ -34,6 +52,12 @@ def _safe_rate(numer: float, denom: float) -> float:
     return round((numer / denom * 100.0) if denom else 0.0, 2)
 
 
+# First characters of the JSON texts worth handing to the parser (object, array, string)
+_JSON_STARTS = ('{', '[', '"')
+# Leading bullet / numbering characters stripped from list lines
+_BULLET_CHARS = '-•*0123456789. '
+
+
 def _ensure_str_list(value: Any) -> list:
     """Coerce various input shapes into a list of strings.
 
@@ -53,16 +77,17 @@ def _ensure_str_list(value: Any) -> list:
         return items
     if isinstance(value, str):
         s = value.strip()
-        # Try JSON
-        try:
-            parsed = json.loads(s)
-            return _ensure_str_list(parsed)
-        except Exception:
-            # Split on newlines, numbered lists, or semicolons
-            lines = [ln.strip().lstrip('-•*0123456789. ') for ln in s.splitlines() if ln.strip()]
-            if len(lines) > 1:
-                return lines
-            return [s]
+        # Try JSON, but only when the text can plausibly be JSON
+        if s.startswith(_JSON_STARTS):
+            try:
+                return _ensure_str_list(json_utils.loads(s))
+            except Exception:
+                pass
+        # Split on newlines, numbered lists, or semicolons
+        lines = [ln.lstrip(_BULLET_CHARS) for ln in (raw.strip() for raw in s.splitlines()) if ln]
+        if len(lines) > 1:
+            return lines
+        return [s]
     # Fallback
     return [str(value)]
 
@@ -82,36 +107,32 @@ def _format_value_plain(value: Any, indent: int = 0) -> str:
     - list -> `- item` lines (recursively formatted if nested)
     - primitive -> string value
     """
-    pad = "  " * indent
-    lines = []
-
     if value is None:
         return ""
+    if not isinstance(value, (dict, list)):
+        return f"{'  ' * indent}{value}"
+    lines: List[str] = []
+    _append_plain_lines(value, indent, lines)
+    return "\n".join(lines)
+
 
+def _append_plain_lines(value: Any, indent: int, lines: List[str]) -> None:
+    """Append the formatted lines of a dict/list to `lines`, nesting in place."""
+    pad = "  " * indent
     if isinstance(value, dict):
         for k, v in value.items():
             if isinstance(v, (dict, list)):
                 lines.append(f"{pad}{k}:")
-                sub = _format_value_plain(v, indent + 1)
-                if sub:
-                    lines.append(sub)
+                _append_plain_lines(v, indent + 1, lines)
             else:
                 lines.append(f"{pad}{k}: {v}")
-        return "\n".join(lines)
-
-    if isinstance(value, list):
+    else:
         for item in value:
             if isinstance(item, (dict, list)):
                 lines.append(f"{pad}-")
-                sub = _format_value_plain(item, indent + 1)
-                if sub:
-                    lines.append(sub)
+                _append_plain_lines(item, indent + 1, lines)
             else:
                 lines.append(f"{pad}- {item}")
-        return "\n".join(lines)
-
-    # Primitive
-    return f"{pad}{value}"
 
 
 escape_map = {
@@ -119,13 +140,24 @@ escape_map = {
     "<": "&lt;",
     ">": "&gt;",
 }
+_ESCAPE_TABLE = str.maketrans(escape_map)
 
 
 def _escape_html(text: str) -> str:
-    out = text or ""
-    for k, v in escape_map.items():
-        out = out.replace(k, v)
-    return out
+    if not text:
+        return ""
+    # Most LLM prose has nothing to escape; containment checks stop at the first hit
+    if "&" in text or "<" in text or ">" in text:
+        return text.translate(_ESCAPE_TABLE)
+    return text
+
+
+def _nonblank_lines(text: str):
+    """Yield the stripped, non-empty lines of text."""
+    for raw in text.splitlines():
+        line = raw.strip()
+        if line:
+            yield line
 
 
 def _to_paragraph_text(text: str) -> str:
@@ -148,53 +180,94 @@ def _format_text_section(value: Any) -> str:
         if not s:
             return ""
         # Try to parse JSON and pretty-print if it works
-        try:
-            parsed = json.loads(s)
-            return _format_value_plain(parsed)
-        except Exception:
-            return s
+        if s.startswith(_JSON_STARTS):
+            try:
+                return _format_value_plain(json_utils.loads(s))
+            except Exception:
+                pass
+        return s
     return str(value)
 
 
+def _format_parsed_section(value: Any) -> str:
+    """Like _format_text_section, for values taken from an already-parsed JSON response.
+
+    Strings are used as-is rather than being parsed as JSON a second time.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return _format_value_plain(value)
+    return str(value).strip()
+
+
+_TOTAL_KEYS = ("sent", "opened", "clicked", "bounced")
+_RATE_KEYS = (("open_rate", "opened"), ("click_rate", "clicked"), ("bounce_rate", "bounced"))
+# Payload strategy field -> strategy keys it may be stored under, in priority order
+_STRATEGY_ALIASES = {
+    "goal": ("goal", "objective"),
+    "audience": ("audience",),
+    "value_proposition": ("value_proposition", "valueProp"),
+    "kpis": ("kpis",),
+    "subject_ideas": ("subject_suggestions", "subject_lines"),
+}
+_STRATEGY_DEFAULTS = {"kpis": {}, "subject_ideas": []}
+
+
+def _first_present(d: Dict[str, Any], keys: tuple, default: Any = None) -> Any:
+    """Return the first truthy value among keys, else default."""
+    for k in keys:
+        v = d.get(k)
+        if v:
+            return v
+    return default
+
+
+def _sum_global_stats(df: pd.DataFrame) -> Dict[str, int]:
+    """Column totals of the provider stats frame, excluding the date column."""
+    return df.drop(columns=["date"], errors="ignore").sum(numeric_only=True).dropna().astype(int).to_dict()
+
+
 def build_campaign_payload(campaign_state: Dict[str, Any], global_stats_df: Optional[pd.DataFrame]) -> Dict[str, Any]:
     """
     Normalize data needed for the final report.
     """
-    campaign_id = campaign_state.get("campaign_id")
-    strategy = campaign_state.get("strategy", {})
-    ab_results = campaign_state.get("ab_results", {})
-    deliverability = campaign_state.get("deliverability_check", {})
+    g = campaign_state.get
+    campaign_id = g("campaign_id")
+    strategy = g("strategy") or {}
+    ab_results = g("ab_results", {})
+    deliverability = g("deliverability_check", {})
 
     # Summaries
-    totals = {
-        "sent": sum(v.get("sent", 0) for v in ab_results.values()) if isinstance(ab_results, dict) else 0,
-        "opened": sum(v.get("opened", 0) for v in ab_results.values()) if isinstance(ab_results, dict) else 0,
-        "clicked": sum(v.get("clicked", 0) for v in ab_results.values()) if isinstance(ab_results, dict) else 0,
-        "bounced": sum(v.get("bounced", 0) for v in ab_results.values()) if isinstance(ab_results, dict) else 0,
+    totals = dict.fromkeys(_TOTAL_KEYS, 0)
+    if isinstance(ab_results, dict):
+        # Single pass over variants accumulating all counters
+        for v in ab_results.values():
+            if isinstance(v, dict):
+                get = v.get
+                for k in _TOTAL_KEYS:
+                    totals[k] += get(k, 0)
+    sent = totals["sent"]
+    for rate_key, count_key in _RATE_KEYS:
+        totals[rate_key] = _safe_rate(totals[count_key], sent)
+
+    strategy_summary = {
+        k: _first_present(strategy, keys, _STRATEGY_DEFAULTS.get(k))
+        for k, keys in _STRATEGY_ALIASES.items()
     }
-    totals["open_rate"] = _safe_rate(totals["opened"], totals["sent"]) if totals else 0
-    totals["click_rate"] = _safe_rate(totals["clicked"], totals["sent"]) if totals else 0
-    totals["bounce_rate"] = _safe_rate(totals["bounced"], totals["sent"]) if totals else 0
+    sg = strategy.get
+    cta = sg("cta")
+    strategy_summary["ctas"] = sg("ctas") or ([cta] if isinstance(cta, str) else [])
 
     global_stats = None
     if global_stats_df is not None and not global_stats_df.empty:
-        numeric_cols = [c for c in global_stats_df.columns if c != "date"]
-        if numeric_cols:
-            s = global_stats_df[numeric_cols].sum()
-            global_stats = {k: int(s[k]) for k in numeric_cols if pd.notna(s[k])}
+        global_stats = _sum_global_stats(global_stats_df) or None
 
     payload = {
         "campaign_id": campaign_id,
-        "campaign_name": campaign_state.get("campaign_name", "Unnamed Campaign"),
+        "campaign_name": g("campaign_name", "Unnamed Campaign"),
         "generated_at": datetime.utcnow().isoformat() + "Z",
-        "strategy": {
-            "goal": strategy.get("goal") or strategy.get("objective"),
-            "audience": strategy.get("audience"),
-            "value_proposition": strategy.get("value_proposition") or strategy.get("valueProp"),
-            "kpis": strategy.get("kpis", {}),
-            "subject_ideas": strategy.get("subject_suggestions") or strategy.get("subject_lines") or [],
-            "ctas": strategy.get("ctas") or ([strategy.get("cta")] if isinstance(strategy.get("cta"), str) else []),
-        },
+        "strategy": strategy_summary,
         "ab_results": ab_results,
         "totals": totals,
         "deliverability": deliverability,
@@ -203,21 +276,166 @@ def build_campaign_payload(campaign_state: Dict[str, Any], global_stats_df: Opti
     return payload
 
 
-def _build_llm_prompt(payload: Dict[str, Any]) -> str:
-    return (
-        "You are an expert email marketing analyst. Given the campaign data JSON below, "
-        "produce a structured analysis with these sections: "
-        "1) Executive Summary (<200 words)\n"
-        "2) Performance Analysis (variant comparison, key drivers)\n"
-        "3) Deliverability Assessment (risks, likely causes)\n"
-        "4) Recommendations (prioritized, concrete actions)\n"
-        "5) Next Steps (checklist for the next 7 days).\n\n"
-        "Return a JSON object with these keys: executive_summary, performance_analysis, "
-        "deliverability_assessment, recommendations, next_steps.\n\n"
-        f"Campaign Data JSON:\n{json.dumps(payload, ensure_ascii=False)}"
+LLM_INSTRUCTIONS = (
+    "You are an expert email marketing analyst. Given the campaign data JSON in the next message, "
+    "produce a structured analysis with these sections: "
+    "1) Executive Summary (<200 words)\n"
+    "2) Performance Analysis (variant comparison, key drivers)\n"
+    "3) Deliverability Assessment (risks, likely causes)\n"
+    "4) Recommendations (prioritized, concrete actions)\n"
+    "5) Next Steps (checklist for the next 7 days).\n\n"
+    "Return a JSON object with these keys: executive_summary, performance_analysis, "
+    "deliverability_assessment, recommendations, next_steps."
+)
+_LLM_SYSTEM_MESSAGE = {"role": "system", "content": LLM_INSTRUCTIONS}
+_LLM_INSTRUCTIONS_HASH = hashlib.blake2b(LLM_INSTRUCTIONS.encode("utf-8"), digest_size=8).hexdigest()
+
+
+OPENAI_API_BASE = "https://api.openai.com/v1"
+
+
+def _offline_llm_result() -> LLMResult:
+    # Fallback deterministic text if no key configured
+    return LLMResult(
+        executive_summary="Executive summary unavailable (no LLM key configured). Overall performance summarized by totals.",
+        performance_analysis="Variant comparison suggests opportunities to optimize subject lines and CTAs.",
+        deliverability_assessment="Review sender reputation, authentication, and content signals.",
+        recommendations=_join_as_bullets("1) Test subject lines\n2) Improve preheaders\n3) Tighten audience hygiene\n4) Iterate on CTA placement."),
+        next_steps=_join_as_bullets("Day 1: Clean list\nDay 2-3: Create A/B subject tests\nDay 4: Template improvements\nDay 5-7: Send, monitor, iterate."),
+    )
+
+
+def _preview_llm_result() -> LLMResult:
+    # Nothing has been sent or checked yet, so there is nothing to analyze
+    return LLMResult(
+        executive_summary="Preview report - no campaign data yet.",
+        performance_analysis="",
+        deliverability_assessment="",
+        recommendations="",
+        next_steps="",
     )
 
 
+def _has_campaign_data(payload: Dict[str, Any]) -> bool:
+    """False for payloads with all-zero totals and no deliverability check."""
+    totals = payload.get("totals") or {}
+    return any(totals.get(k, 0) for k in _TOTAL_KEYS) or bool(payload.get("deliverability"))
+
+
+def _failed_llm_result() -> LLMResult:
+    return LLMResult(
+        executive_summary="Executive summary unavailable due to LLM call failure.",
+        performance_analysis="",
+        deliverability_assessment="",
+        recommendations="",
+        next_steps="",
+    )
+
+
+def _llm_request_body(payload: Dict[str, Any], model: str) -> Dict[str, Any]:
+    """Chat completions request body for a single campaign payload."""
+    return {
+        "model": model,
+        "messages": [
+            _LLM_SYSTEM_MESSAGE,
+            # Campaign data travels as its own message, serialized exactly once
+            {"role": "user", "content": json_utils.dumps(payload)},
+        ],
+        "temperature": 0.3,
+        "response_format": {"type": "json_object"},
+    }
+
+
+def _completion_text(raw: bytes) -> str:
+    """Message content of a raw chat completions response body."""
+    data = json_utils.loads(raw)
+    return data.get("choices", [{}])[0].get("message", {}).get("content", "{}")
+
+
+def _llm_result_from_text(text: str) -> LLMResult:
+    """Parse the model's message content into an LLMResult."""
+    try:
+        parsed = json_utils.loads(text)
+    except Exception:
+        # If the model returned text not JSON, use raw text as the executive summary
+        parsed = {
+            "executive_summary": text[:2000],
+            "performance_analysis": "",
+            "deliverability_assessment": "",
+            "recommendations": "",
+            "next_steps": "",
+        }
+    # Normalize fields into clean plain text (indent lists/dicts)
+    exec_sum_raw = parsed.get("executive_summary", "")
+    perf_raw = parsed.get("performance_analysis", "")
+    deliver_raw = parsed.get("deliverability_assessment", "")
+    recs = _join_as_bullets(parsed.get("recommendations", ""))
+    steps = _join_as_bullets(parsed.get("next_steps", ""))
+
+    return LLMResult(
+        executive_summary=_format_parsed_section(exec_sum_raw),
+        performance_analysis=_format_parsed_section(perf_raw),
+        deliverability_assessment=_format_parsed_section(deliver_raw),
+        recommendations=recs,
+        next_steps=steps,
+    )
+
+
+def _llm_cache_path(payload: Dict[str, Any]) -> str:
+    """Content-addressed cache file for a payload (ignores the generated_at timestamp).
+
+    The model and the instructions are part of the key, so changing either
+    one stops stale insights from being served.
+    """
+    key_payload = {k: v for k, v in payload.items() if k != "generated_at"}
+    key_source = {
+        "model": getattr(config, "OPENAI_MODEL", "gpt-4o-mini"),
+        "instructions": _LLM_INSTRUCTIONS_HASH,
+        "payload": key_payload,
+    }
+    key = hashlib.blake2b(
+        json_utils.dumps(key_source, sort_keys=True).encode("utf-8"),
+        digest_size=16,
+    ).hexdigest()
+    return os.path.join(config.RESULTS_DIR, "_llm_cache", f"{key}.json")
+
+
+def _load_cached_insights(payload: Dict[str, Any]) -> Optional[LLMResult]:
+    try:
+        with open(_llm_cache_path(payload), "rb") as f:
+            return LLMResult(**json_utils.loads(f.read()))
+    except Exception:
+        return None
+
+
+def _store_cached_insights(payload: Dict[str, Any], result: LLMResult) -> None:
+    path = _llm_cache_path(payload)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json_utils.dumps(asdict(result)))
+        os.replace(tmp_path, path)
+    except Exception:
+        # Cache is best-effort
+        pass
+
+
+_HTTP_SESSION = None
+
+
+def _get_http_session():
+    """Shared keep-alive session for OpenAI HTTP calls, created on first use."""
+    global _HTTP_SESSION
+    if _HTTP_SESSION is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+        _HTTP_SESSION = session
+    return _HTTP_SESSION
+
+
 def call_llm_for_insights(payload: Dict[str, Any]) -> LLMResult:
     # Minimal OpenAI client without extra deps; assumes 'openai' package or HTTP call available.
     # To keep dependencies simple, we simulate a fallback if OPENAI_API_KEY is not set.
@@ -225,172 +443,117 @@ def call_llm_for_insights(payload: Dict[str, Any]) -> LLMResult:
     model = getattr(config, "OPENAI_MODEL", "gpt-4o-mini")
 
     if not api_key:
-        # Fallback deterministic text if no key configured
-        return LLMResult(
-            executive_summary="Executive summary unavailable (no LLM key configured). Overall performance summarized by totals.",
-            performance_analysis="Variant comparison suggests opportunities to optimize subject lines and CTAs.",
-            deliverability_assessment="Review sender reputation, authentication, and content signals.",
-            recommendations=_join_as_bullets("1) Test subject lines\n2) Improve preheaders\n3) Tighten audience hygiene\n4) Iterate on CTA placement."),
-            next_steps=_join_as_bullets("Day 1: Clean list\nDay 2-3: Create A/B subject tests\nDay 4: Template improvements\nDay 5-7: Send, monitor, iterate."),
-        )
+        return _offline_llm_result()
+    if not _has_campaign_data(payload):
+        return _preview_llm_result()
+
+    cached = _load_cached_insights(payload)
+    if cached is not None:
+        return cached
 
     try:
-        import requests
-        url = "https://api.openai.com/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-        }
-        prompt = _build_llm_prompt(payload)
-        body = {
-            "model": model,
-            "messages": [
-                {"role": "system", "content": "You are a helpful assistant."},
-                {"role": "user", "content": prompt},
-            ],
-            "temperature": 0.3,
-        }
-        resp = requests.post(url, headers=headers, json=body, timeout=60)
+        url = f"{OPENAI_API_BASE}/chat/completions"
+        headers = {"Authorization": f"Bearer {api_key}"}
+        body = _llm_request_body(payload, model)
+        # json= sets the Content-Type header
+        resp = _get_http_session().post(url, headers=headers, json=body, timeout=60)
         resp.raise_for_status()
-        data = resp.json()
-        text = data.get("choices", [{}])[0].get("message", {}).get("content", "{}")
-        try:
-            parsed = json.loads(text)
-        except Exception:
-            # If the model returned text not JSON, use raw text as the executive summary
-            parsed = {
-                "executive_summary": text[:2000],
-                "performance_analysis": "",
-                "deliverability_assessment": "",
-                "recommendations": "",
-                "next_steps": "",
-            }
-        # Normalize fields into clean plain text (indent lists/dicts)
-        exec_sum_raw = parsed.get("executive_summary", "")
-        perf_raw = parsed.get("performance_analysis", "")
-        deliver_raw = parsed.get("deliverability_assessment", "")
-        recs = _join_as_bullets(parsed.get("recommendations", ""))
-        steps = _join_as_bullets(parsed.get("next_steps", ""))
-
-        return LLMResult(
-            executive_summary=_format_text_section(exec_sum_raw),
-            performance_analysis=_format_text_section(perf_raw),
-            deliverability_assessment=_format_text_section(deliver_raw),
-            recommendations=recs,
-            next_steps=steps,
-        )
+        result = _llm_result_from_text(_completion_text(resp.content))
+        _store_cached_insights(payload, result)
+        return result
     except Exception:
-        return LLMResult(
-            executive_summary="Executive summary unavailable due to LLM call failure.",
-            performance_analysis="",
-            deliverability_assessment="",
-            recommendations="",
-            next_steps="",
-        )
+        return _failed_llm_result()
 
 
 # ReportLab rendering helpers
 
-def _render_reportlab_pdf(payload: Dict[str, Any], llm: LLMResult, pdf_path: str, global_df: Optional[pd.DataFrame]) -> None:
+# Key Metrics table: (label, totals key, value suffix)
+_METRIC_ROWS = (
+    ("Sent", "sent", ""),
+    ("Opened", "opened", ""),
+    ("Open Rate", "open_rate", "%"),
+    ("Clicked", "clicked", ""),
+    ("Click Rate", "click_rate", "%"),
+    ("Bounced", "bounced", ""),
+    ("Bounce Rate", "bounce_rate", "%"),
+)
+_VARIANT_ROW_KEYS = ("sent", "opened", "clicked", "open_rate", "click_rate", "bounced")
+
+
+def _variant_row(name: str, metrics: Dict[str, Any]) -> List[str]:
+    """One Variant Comparison table row."""
+    sent, opened, clicked, open_rate, click_rate, bounced = [metrics.get(k, 0) for k in _VARIANT_ROW_KEYS]
+    return [name, str(sent), str(opened), str(clicked), f"{open_rate}%", f"{click_rate}%", str(bounced)]
+
+
+def _render_reportlab_pdf(payload: Dict[str, Any], llm: LLMResult, pdf_path: str) -> None:
     doc = SimpleDocTemplate(pdf_path, pagesize=A4, leftMargin=36, rightMargin=36, topMargin=36, bottomMargin=36)
-    styles = getSampleStyleSheet()
+    title_style = _STYLES['Title']
+    normal_style = _STYLES['Normal']
+    heading_style = _STYLES['Heading2']
+    body_style = _STYLES['BodyText']
     story = []
 
     title = f"Campaign Report: {payload.get('campaign_name')} ({payload.get('campaign_id')})"
-    story.append(Paragraph(title, styles['Title']))
-    story.append(Paragraph(f"Generated: {payload.get('generated_at')}", styles['Normal']))
+    story.append(Paragraph(title, title_style))
+    story.append(Paragraph(f"Generated: {payload.get('generated_at')}", normal_style))
     story.append(Spacer(1, 12))
 
-    story.append(Paragraph("Executive Summary", styles['Heading2']))
-    story.append(Paragraph(_to_paragraph_text(llm.executive_summary or 'N/A'), styles['BodyText']))
+    story.append(Paragraph("Executive Summary", heading_style))
+    story.append(Paragraph(_to_paragraph_text(llm.executive_summary or 'N/A'), body_style))
     story.append(Spacer(1, 12))
 
     totals = payload.get('totals', {}) or {}
-    metrics_data = [
-        ["Sent", str(totals.get('sent', 0))],
-        ["Opened", str(totals.get('opened', 0))],
-        ["Open Rate", f"{totals.get('open_rate', 0)}%"],
-        ["Clicked", str(totals.get('clicked', 0))],
-        ["Click Rate", f"{totals.get('click_rate', 0)}%"],
-        ["Bounced", str(totals.get('bounced', 0))],
-        ["Bounce Rate", f"{totals.get('bounce_rate', 0)}%"],
-    ]
+    metrics_data = [[label, f"{totals.get(key, 0)}{suffix}"] for label, key, suffix in _METRIC_ROWS]
     t = Table(metrics_data, hAlign='LEFT', colWidths=[120, 200])
-    t.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (-1,0), colors.whitesmoke),
-        ('GRID', (0,0), (-1,-1), 0.25, colors.grey),
-        ('FONTNAME', (0,0), (-1,-1), 'Helvetica'),
-        ('ALIGN', (1,0), (1,-1), 'LEFT'),
-    ]))
-    story.append(Paragraph("Key Metrics", styles['Heading2']))
+    t.setStyle(_METRIC_TABLE_STYLE)
+    story.append(Paragraph("Key Metrics", heading_style))
     story.append(t)
     story.append(Spacer(1, 12))
 
     # Variant comparison table
     ab = payload.get('ab_results', {}) or {}
     table_data = [["Variant", "Sent", "Opened", "Clicked", "Open Rate", "Click Rate", "Bounced"]]
-    for v, m in ab.items():
-        table_data.append([
-            v,
-            str(m.get('sent', 0)),
-            str(m.get('opened', 0)),
-            str(m.get('clicked', 0)),
-            f"{m.get('open_rate', 0)}%",
-            f"{m.get('click_rate', 0)}%",
-            str(m.get('bounced', 0)),
-        ])
-    vt = Table(table_data, hAlign='LEFT')
-    vt.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (-1,0), colors.whitesmoke),
-        ('GRID', (0,0), (-1,-1), 0.25, colors.grey),
-        ('FONTNAME', (0,0), (-1,-1), 'Helvetica'),
-        ('ALIGN', (1,1), (-1,-1), 'LEFT'),
-    ]))
-    story.append(Paragraph("Variant Comparison", styles['Heading2']))
+    table_data.extend(_variant_row(v, m) for v, m in ab.items())
+    # LongTable lays out large variant lists incrementally and splits them across pages
+    vt = LongTable(table_data, hAlign='LEFT', repeatRows=1, splitByRow=1)
+    vt.setStyle(_DATA_TABLE_STYLE)
+    story.append(Paragraph("Variant Comparison", heading_style))
     story.append(vt)
     story.append(Spacer(1, 12))
 
-    story.append(Paragraph("Performance Analysis", styles['Heading2']))
-    story.append(Paragraph(_to_paragraph_text(llm.performance_analysis or 'N/A'), styles['BodyText']))
+    story.append(Paragraph("Performance Analysis", heading_style))
+    story.append(Paragraph(_to_paragraph_text(llm.performance_analysis or 'N/A'), body_style))
     story.append(Spacer(1, 12))
 
-    story.append(Paragraph("Deliverability Assessment", styles['Heading2']))
-    story.append(Paragraph(_to_paragraph_text(llm.deliverability_assessment or 'N/A'), styles['BodyText']))
+    story.append(Paragraph("Deliverability Assessment", heading_style))
+    story.append(Paragraph(_to_paragraph_text(llm.deliverability_assessment or 'N/A'), body_style))
     story.append(Spacer(1, 12))
 
-    # Provider global stats summary
-    if global_df is not None and not global_df.empty:
-        story.append(Paragraph("Provider Global Stats (Totals)", styles['Heading2']))
-        numeric_cols = [c for c in global_df.columns if c != 'date']
-        if numeric_cols:
-            sums = global_df[numeric_cols].sum()
-            gdata = [["Metric", "Total"]] + [[k.replace('_',' ').title(), str(int(sums[k]))] for k in numeric_cols]
-            gt = Table(gdata, hAlign='LEFT', colWidths=[200, 100])
-            gt.setStyle(TableStyle([
-                ('BACKGROUND', (0,0), (-1,0), colors.whitesmoke),
-                ('GRID', (0,0), (-1,-1), 0.25, colors.grey),
-                ('FONTNAME', (0,0), (-1,-1), 'Helvetica'),
-                ('ALIGN', (1,1), (-1,-1), 'LEFT'),
-            ]))
-            story.append(gt)
-            story.append(Spacer(1, 12))
-
-    story.append(Paragraph("Recommendations", styles['Heading2']))
+    # Provider global stats summary (totals already computed for the payload)
+    global_stats = payload.get('sendgrid_global')
+    if global_stats:
+        story.append(Paragraph("Provider Global Stats (Totals)", heading_style))
+        gdata = [["Metric", "Total"]] + [[k.replace('_',' ').title(), str(v)] for k, v in global_stats.items()]
+        gt = Table(gdata, hAlign='LEFT', colWidths=[200, 100])
+        gt.setStyle(_DATA_TABLE_STYLE)
+        story.append(gt)
+        story.append(Spacer(1, 12))
+
+    story.append(Paragraph("Recommendations", heading_style))
     if llm.recommendations:
-        for line in llm.recommendations.splitlines():
-            if line.strip():
-                story.append(Paragraph(f"• {line.strip()}", styles['BodyText']))
+        for line in _nonblank_lines(llm.recommendations):
+            story.append(Paragraph("• " + line, body_style))
     else:
-        story.append(Paragraph('N/A', styles['BodyText']))
+        story.append(Paragraph('N/A', body_style))
     story.append(Spacer(1, 12))
 
-    story.append(Paragraph("Next Steps", styles['Heading2']))
+    story.append(Paragraph("Next Steps", heading_style))
     if llm.next_steps:
-        for line in llm.next_steps.splitlines():
-            if line.strip():
-                story.append(Paragraph(f"• {line.strip()}", styles['BodyText']))
+        for line in _nonblank_lines(llm.next_steps):
+            story.append(Paragraph("• " + line, body_style))
     else:
-        story.append(Paragraph('N/A', styles['BodyText']))
+        story.append(Paragraph('N/A', body_style))
 
     doc.build(story)
 
@@ -404,7 +567,11 @@ def generate_pdf_report(campaign_state: Dict[str, Any], results_dir: str, global
     os.makedirs(results_dir, exist_ok=True)
     payload = build_campaign_payload(campaign_state, global_stats_df)
     llm = call_llm_for_insights(payload)
+    return _export_report(campaign_state, results_dir, payload, llm)
+
 
+def _export_report(campaign_state: Dict[str, Any], results_dir: str, payload: Dict[str, Any], llm: LLMResult) -> str:
+    """Render the report for a campaign from its payload and LLM insights."""
     # If LLM didn't return recommendations/next_steps, fall back to any existing report content
     report_section = campaign_state.get('campaign_report', {}) or {}
     if not llm.recommendations:
@@ -421,13 +588,13 @@ def generate_pdf_report(campaign_state: Dict[str, Any], results_dir: str, global
     pdf_path = os.path.join(report_dir, f"final_report_{campaign_id}.pdf")
 
     if REPORTLAB_AVAILABLE:
-        _render_reportlab_pdf(payload, llm, pdf_path, global_stats_df)
+        _render_reportlab_pdf(payload, llm, pdf_path)
         return pdf_path
 
     # Fallback: create a minimal HTML if ReportLab is not available
     html_path = os.path.join(report_dir, f"final_report_{campaign_id}.html")
 
-    def _build_plain_text_report(payload: Dict[str, Any], llm: LLMResult, global_df: Optional[pd.DataFrame]) -> str:
+    def _build_plain_text_report(payload: Dict[str, Any], llm: LLMResult) -> str:
         lines = []
         lines.append(f"Campaign Report: {payload.get('campaign_name')} ({payload.get('campaign_id')})")
         lines.append(f"Generated: {payload.get('generated_at')}")
@@ -476,9 +643,7 @@ def generate_pdf_report(campaign_state: Dict[str, Any], results_dir: str, global
         lines.append("Recommendations")
         lines.append("----------------")
         if llm.recommendations:
-            for line in llm.recommendations.splitlines():
-                if line.strip():
-                    lines.append(f"- {line.strip()}")
+            lines.extend("- " + line for line in _nonblank_lines(llm.recommendations))
         else:
             lines.append("N/A")
         lines.append("")
@@ -486,16 +651,16 @@ def generate_pdf_report(campaign_state: Dict[str, Any], results_dir: str, global
         lines.append("Next Steps")
         lines.append("----------")
         if llm.next_steps:
-            for line in llm.next_steps.splitlines():
-                if line.strip():
-                    lines.append(f"- {line.strip()}")
+            lines.extend("- " + line for line in _nonblank_lines(llm.next_steps))
         else:
             lines.append("N/A")
         lines.append("")
 
         return "\n".join(lines)
 
-    text_body = _build_plain_text_report(payload, llm, global_stats_df)
-    with open(html_path, "w", encoding="utf-8") as f:
-        f.write("<html><body><pre>" + _escape_html(text_body) + "</pre></body></html>")
+    text_body = _build_plain_text_report(payload, llm)
+    with open(html_path, "w", encoding="utf-8", buffering=1 << 16) as f:
+        f.write("<html><body><pre>")
+        f.write(_escape_html(text_body))
+        f.write("</pre></body></html>")
     return html_path
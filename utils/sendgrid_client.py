@@ -1,13 +1,29 @@
 """SendGrid client for fetching email statistics."""
 from sendgrid import SendGridAPIClient
+from dotenv import load_dotenv
 from typing import List, Dict, Any
 from datetime import datetime, timedelta
 import logging
-import json
+import os
+
+from utils import json_utils
+
+load_dotenv()
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# SendGrid metrics summed into the "requests" column
+_REQUEST_KEYS = (
+    "blocks", "bounce_drops", "deferred", "delivered", "invalid_emails", "processed",
+    "requests", "spam_report_drops", "spam_reports", "unsubscribe_drops", "unsubscribes",
+)
+# SendGrid metrics copied into each row as-is, in output column order
+_STAT_FIELDS = (
+    "delivered", "opens", "unique_opens", "clicks", "unique_clicks",
+    "bounces", "spam_reports", "blocks", "unsubscribes",
+)
+
 def get_email_stats(start_date: str, end_date: str, api_key: str = None) -> List[Dict[str, Any]]:
     """
     Fetch email statistics from SendGrid API.
@@ -20,11 +36,6 @@ def get_email_stats(start_date: str, end_date: str, api_key: str = None) -> List
     Returns:
         List of statistics dictionaries
     """
-    import os
-    from dotenv import load_dotenv
-    
-    load_dotenv()
-    
     if not api_key:
         api_key = os.getenv("SENDGRID_API_KEY")
     
@@ -51,11 +62,11 @@ def get_email_stats(start_date: str, end_date: str, api_key: str = None) -> List
         if response.status_code == 200:
             stats_data = response.body
             
-            # Handle bytes response
-            if isinstance(stats_data, bytes):
+            # Handle bytes response (parsed directly, without decoding to str first)
+            if isinstance(stats_data, (bytes, bytearray)):
                 try:
-                    stats_data = json.loads(stats_data.decode('utf-8'))
-                except json.JSONDecodeError as e:
+                    stats_data = json_utils.loads(stats_data)
+                except ValueError as e:
                     logger.error(f"Failed to decode JSON from bytes response: {e}")
                     return []
             
@@ -78,19 +89,10 @@ def get_email_stats(start_date: str, end_date: str, api_key: str = None) -> List
                 else:
                     metrics = {}
                 
-                result.append({
-                    "date": date_str,
-                    "requests": metrics.get("blocks", 0) + metrics.get("bounce_drops", 0) + metrics.get("deferred", 0) + metrics.get("delivered", 0) + metrics.get("invalid_emails", 0) + metrics.get("processed", 0) + metrics.get("requests", 0) + metrics.get("spam_report_drops", 0) + metrics.get("spam_reports", 0) + metrics.get("unsubscribe_drops", 0) + metrics.get("unsubscribes", 0),
-                    "delivered": metrics.get("delivered", 0),
-                    "opens": metrics.get("opens", 0),
-                    "unique_opens": metrics.get("unique_opens", 0),
-                    "clicks": metrics.get("clicks", 0),
-                    "unique_clicks": metrics.get("unique_clicks", 0),
-                    "bounces": metrics.get("bounces", 0),
-                    "spam_reports": metrics.get("spam_reports", 0),
-                    "blocks": metrics.get("blocks", 0),
-                    "unsubscribes": metrics.get("unsubscribes", 0)
-                })
+                get = metrics.get
+                row = {"date": date_str, "requests": sum(get(k, 0) for k in _REQUEST_KEYS)}
+                row.update((k, get(k, 0)) for k in _STAT_FIELDS)
+                result.append(row)
             
             return result
         else:
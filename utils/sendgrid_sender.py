@@ -1,19 +1,153 @@
 """SendGrid email sender with tracking capabilities."""
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail, Email, To, Content, Personalization, CustomArg
-from sendgrid.helpers.mail import TrackingSettings, ClickTracking, OpenTracking, MailSettings
 from typing import Dict, List, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
 import logging
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from utils.message_id_store import MessageIdStore
 from datetime import datetime
 import json
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# SendGrid v3 mail/send accepts at most this many personalizations per request
+MAX_PERSONALIZATIONS = 1000
+SENDGRID_MAIL_SEND_URL = "https://api.sendgrid.com/v3/mail/send"
+
+# Identical for every message; shared by all payloads (only serialized, never mutated)
+_TRACKING_SETTINGS = {
+    "click_tracking": {"enable": True, "enable_text": True},
+    "open_tracking": {"enable": True},
+}
+_SANDBOX_MAIL_SETTINGS = {"sandbox_mode": {"enable": True}}
+
+_MESSAGE_ID_HEADERS = ("X-Message-Id", "x-message-id")
+
+# Retry policy for rate-limited (429) and server-error (5xx) responses
+MAX_SEND_ATTEMPTS = 5
+# Upper bound on any single retry wait, including a server-sent Retry-After
+RETRY_MAX_DELAY = 60.0
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`."""
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if not rate > 0:  # also rejects NaN
+            raise ValueError(f"Token bucket rate must be positive, got {rate}")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def reserve(self) -> float:
+        """Take a token and return how many seconds to wait before using it."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= 1
+            # A negative balance is owed to earlier callers; wait until it is repaid
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+    
+    def acquire(self):
+        """Block until a token is available."""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+
+def _retry_delay(response: Any, attempt: int) -> Optional[float]:
+    """
+    Seconds to wait before retrying a mail/send response, or None if it should not be retried.
+    
+    Args:
+        response: HTTP response from requests
+        attempt: Zero-based index of the attempt that produced the response
+        
+    Returns:
+        Retry-After when the server sent one, else exponential backoff with jitter,
+        capped at RETRY_MAX_DELAY
+    """
+    if response.status_code not in _RETRY_STATUSES or attempt + 1 >= MAX_SEND_ATTEMPTS:
+        return None
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return min(max(0.0, float(retry_after)), RETRY_MAX_DELAY)
+        except ValueError:
+            pass
+    return min((2 ** attempt) + random.random(), RETRY_MAX_DELAY)
+
+
+def _personalization(to_email: str, to_name: str, campaign_id: str, variant: str) -> Dict[str, Any]:
+    """One mail/send personalization carrying the custom args webhook events are attributed by."""
+    to = {"email": to_email, "name": to_name} if to_name else {"email": to_email}
+    return {
+        "to": [to],
+        "custom_args": {
+            "campaign_id": campaign_id or "",
+            "variant": variant or "",
+            "recipient_email": to_email or "",
+        },
+    }
+
+
+def _build_payload(sender: Dict[str, str], personalizations: List[Dict[str, Any]], subject: str,
+                   html_body: str, body: str, enable_tracking: bool = True, sandbox: bool = False) -> Dict[str, Any]:
+    """
+    Build a v3 mail/send JSON payload directly, without the SDK helper objects.
+    
+    Args:
+        sender: The "from" object ({"email": ..., "name": ...})
+        personalizations: Personalization dicts (see _personalization)
+        subject: Email subject
+        html_body: HTML body
+        body: Plain-text body
+        enable_tracking: Enable click and open tracking
+        sandbox: Enable sandbox mode (no real delivery)
+        
+    Returns:
+        Payload dictionary ready to POST as JSON
+    """
+    payload = {
+        "personalizations": personalizations,
+        "from": sender,
+        "subject": subject,
+        "content": [
+            {"type": "text/plain", "value": body},
+            {"type": "text/html", "value": html_body},
+        ],
+    }
+    if enable_tracking:
+        payload["tracking_settings"] = _TRACKING_SETTINGS
+    if sandbox:
+        payload["mail_settings"] = _SANDBOX_MAIL_SETTINGS
+    return payload
+
+
 class SendGridSender:
     """SendGrid email sender with activity tracking."""
     
-    def __init__(self, api_key: str, from_email: str, from_name: str = "Marketing Campaign System", sandbox: bool = False):
+    # Wrapper for the text/html part, split around the body
+    _HTML_PREFIX = """
+            <html>
+              <body>
+                """
+    _HTML_SUFFIX = """
+              </body>
+            </html>
+            """
+    
+    def __init__(self, api_key: str, from_email: str, from_name: str = "Marketing Campaign System", sandbox: bool = False,
+                 max_workers: int = 16, requests_per_second: float = 10.0,
+                 message_id_db: str = ":memory:"):
         """
         Initialize SendGrid sender.
         
@@ -21,13 +155,55 @@ class SendGridSender:
             api_key: SendGrid API key
             from_email: Sender email address (must be verified in SendGrid)
             from_name: Sender display name
+            sandbox: Enable SendGrid sandbox mode (no real delivery)
+            max_workers: Maximum concurrent SendGrid requests used by send_batch
+            requests_per_second: Ceiling on mail/send requests per second (token bucket)
+            message_id_db: SQLite path where sent message IDs are kept (":memory:" for process-local)
         """
         self.api_key = api_key
         self.from_email = from_email
         self.from_name = from_name
-        self.client = SendGridAPIClient(api_key)
-        self.message_ids = {}  # Track message IDs for each recipient
+        self._from = {"email": from_email, "name": from_name}
+        # The SDK opens a new connection per send; post through one keep-alive
+        # session whose pool matches the number of concurrent batch requests
+        self._session = requests.Session()
+        self._session.headers.update({"Authorization": f"Bearer {api_key}"})
+        self._session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=max(1, max_workers)))
+        self.message_store = MessageIdStore(message_id_db)  # Track message IDs for each recipient
         self.sandbox = sandbox
+        self.max_workers = max_workers
+        self._bucket = TokenBucket(requests_per_second)
+    
+    @classmethod
+    def _html_body(cls, body: str) -> str:
+        """Wrap a plain-text body in the HTML used for the text/html part."""
+        return cls._HTML_PREFIX + body.replace("\n", "<br>") + cls._HTML_SUFFIX
+    
+    def _post_mail(self, payload: Dict[str, Any]) -> requests.Response:
+        """POST a mail/send JSON payload over the shared keep-alive session, retrying 429/5xx."""
+        for attempt in range(MAX_SEND_ATTEMPTS):
+            self._bucket.acquire()
+            response = self._session.post(SENDGRID_MAIL_SEND_URL, json=payload, timeout=30)
+            delay = _retry_delay(response, attempt)
+            if delay is None:
+                return response
+            logger.warning(f"⚠️ SendGrid returned {response.status_code}; retrying in {delay:.1f}s (attempt {attempt + 1}/{MAX_SEND_ATTEMPTS})")
+            time.sleep(delay)
+        return response
+    
+    @staticmethod
+    def _response_details(response: Any) -> tuple:
+        """Return (status_code, X-Message-Id) from a SendGrid response."""
+        status_code = getattr(response, "status_code", None)
+        if status_code is None:
+            status_code = getattr(response, "status", 202)  # Default accepted status
+        
+        # requests headers are case-insensitive; a plain dict may use either spelling
+        headers = getattr(response, "headers", None) or {}
+        message_id = next((headers[k] for k in _MESSAGE_ID_HEADERS if k in headers), "") or ""
+        
+        logger.info(f"📬 SendGrid Response - Status: {status_code}, Message ID: {message_id or 'Not provided'}")
+        return status_code, message_id
     
     def send_email(self, recipient_email: str, recipient_name: str, subject: str, 
                    body: str, variant: str = "A", campaign_id: str = "") -> Dict[str, Any]:
@@ -46,115 +222,11 @@ class SendGridSender:
             Dictionary with send result and message ID
         """
         try:
-            # Create HTML version
-            html_body = f"""
-            <html>
-              <body>
-                {body.replace(chr(10), '<br>')}
-              </body>
-            </html>
-            """
-            
-            # Create email message
-            message = Mail(
-                from_email=Email(self.from_email, self.from_name),
-                to_emails=To(recipient_email, recipient_name),
-                subject=subject,
-                html_content=Content("text/html", html_body)
-            )
-
-            # Add plain text as alternate part via add_content (Mail already set html)
-            message.add_content(Content("text/plain", body))
-            
-            # Add custom tracking data (use add_custom_arg on the Personalization)
-            # Ensure a Personalization exists
-            if not message.personalizations:
-                personalization = Personalization()
-                personalization.add_to(Email(recipient_email, recipient_name))
-                message.add_personalization(personalization)
-            personalization = message.personalizations[0]
-            personalization.add_custom_arg(CustomArg("campaign_id", campaign_id or ""))
-            personalization.add_custom_arg(CustomArg("variant", variant or ""))
-            personalization.add_custom_arg(CustomArg("recipient_email", recipient_email or ""))
-            
-            # Enable click and open tracking (use TrackingSettings helper)
-            ts = TrackingSettings()
-            ts.click_tracking = ClickTracking(enable=True, enable_text=True)
-            ts.open_tracking = OpenTracking(enable=True)
-            message.tracking_settings = ts
-
-            # Optional: Sandbox mode for testing without real delivery
-            if self.sandbox:
-                ms = MailSettings()
-                # Some sendgrid versions do not expose SandboxMode; use dict form to enable
-                try:
-                    ms.sandbox_mode = {"enable": True}
-                except Exception:
-                    # Fallback: attach mail_settings as dict
-                    message.mail_settings = {"sandbox_mode": {"enable": True}}
-                else:
-                    message.mail_settings = ms
-            
-            # Send email
             logger.info(f"📤 Attempting to send email to {recipient_email} via SendGrid...")
-            response = self.client.send(message)
-            
-            # Extract message ID and status code
-            message_id = ""
-            status_code = 202  # Default accepted status
-            
-            # Handle response (SendGrid returns a Response object)
-            try:
-                # Get status code
-                if hasattr(response, 'status_code'):
-                    status_code = response.status_code
-                elif hasattr(response, 'status'):
-                    status_code = response.status
-                
-                # Get headers and message ID
-                headers = getattr(response, 'headers', None)
-                if headers:
-                    try:
-                        # CaseInsensitiveDict supports get directly
-                        message_id = headers.get('X-Message-Id') or headers.get('x-message-id') or ""
-                    except Exception:
-                        try:
-                            headers_dict = dict(headers)
-                            message_id = headers_dict.get('X-Message-Id') or headers_dict.get('x-message-id') or ""
-                        except Exception:
-                            message_id = ""
-                
-                logger.info(f"📬 SendGrid Response - Status: {status_code}, Message ID: {message_id or 'Not provided'}")
-                
-            except Exception as header_error:
-                logger.warning(f"⚠️ Could not extract response details: {str(header_error)}")
-                status_code = 202
-            
-            # Store message ID for tracking
-            if message_id:
-                key = f"{campaign_id}_{variant}_{recipient_email}"
-                self.message_ids[key] = message_id
-            
-            # Check if send was successful (202 = accepted, 200 = OK)
-            # SendGrid typically returns 202 for accepted emails
-            if status_code in [200, 202]:
-                logger.info(f"✅ Email accepted by SendGrid for {recipient_email} (Status: {status_code})")
-                return {
-                    "success": True,
-                    "message_id": message_id,
-                    "status_code": status_code,
-                    "recipient": recipient_email,
-                    "sandbox": self.sandbox,
-                }
-            else:
-                logger.error(f"❌ SendGrid returned non-success status {status_code} for {recipient_email}")
-                return {
-                    "success": False,
-                    "error": f"SendGrid returned status {status_code}",
-                    "status_code": status_code,
-                    "recipient": recipient_email,
-                    "sandbox": self.sandbox,
-                }
+            payload = self._email_payload(recipient_email, recipient_name, subject, body, variant, campaign_id)
+            response = self._post_mail(payload)
+            status_code, message_id = self._response_details(response)
+            return self._email_result(recipient_email, status_code, message_id, variant, campaign_id)
             
         except Exception as e:
             logger.error(f"❌ Failed to send email to {recipient_email}: {str(e)}")
@@ -167,11 +239,121 @@ class SendGridSender:
                 "sandbox": self.sandbox,
             }
     
+    def _email_payload(self, recipient_email: str, recipient_name: str, subject: str, body: str,
+                       variant: str, campaign_id: str) -> Dict[str, Any]:
+        """mail/send JSON payload for a single recipient."""
+        return _build_payload(
+            self._from,
+            [_personalization(recipient_email, recipient_name, campaign_id, variant)],
+            subject, self._html_body(body), body, sandbox=self.sandbox,
+        )
+    
+    def _email_result(self, recipient_email: str, status_code: int, message_id: str,
+                      variant: str, campaign_id: str) -> Dict[str, Any]:
+        """Record the message ID and build the send_email result for a response."""
+        # Store message ID for tracking
+        if message_id:
+            self.message_store.record(campaign_id, variant, {recipient_email: message_id})
+        
+        # Check if send was successful (202 = accepted, 200 = OK)
+        # SendGrid typically returns 202 for accepted emails
+        if status_code in [200, 202]:
+            logger.info(f"✅ Email accepted by SendGrid for {recipient_email} (Status: {status_code})")
+            return {
+                "success": True,
+                "message_id": message_id,
+                "status_code": status_code,
+                "recipient": recipient_email,
+                "sandbox": self.sandbox,
+            }
+        logger.error(f"❌ SendGrid returned non-success status {status_code} for {recipient_email}")
+        return {
+            "success": False,
+            "error": f"SendGrid returned status {status_code}",
+            "status_code": status_code,
+            "recipient": recipient_email,
+            "sandbox": self.sandbox,
+        }
+    
+    def _send_chunk(self, chunk: List[Dict[str, str]], subject: str, html_body: str, body: str,
+                    variant: str, campaign_id: str) -> List[Dict[str, Any]]:
+        """
+        Send one SendGrid request carrying a personalization per recipient.
+        
+        Args:
+            chunk: Recipients with an 'email' key (at most MAX_PERSONALIZATIONS)
+            subject: Email subject
+            html_body: HTML body (see _html_body)
+            body: Plain-text body
+            variant: A/B test variant
+            campaign_id: Campaign identifier
+            
+        Returns:
+            One per_recipient row per recipient, in chunk order (see _chunk_results)
+        """
+        try:
+            payload = self._chunk_payload(chunk, subject, html_body, body, variant, campaign_id)
+            logger.info(f"📤 Sending {len(chunk)} emails in one SendGrid request...")
+            response = self._post_mail(payload)
+            status_code, batch_message_id = self._response_details(response)
+        except Exception as e:
+            logger.error(f"❌ Failed to send batch of {len(chunk)} emails: {str(e)}")
+            return self._chunk_failure(chunk, str(e))
+        return self._chunk_results(chunk, status_code, batch_message_id, variant, campaign_id)
+    
+    def _chunk_payload(self, chunk: List[Dict[str, str]], subject: str, html_body: str, body: str,
+                       variant: str, campaign_id: str) -> Dict[str, Any]:
+        """mail/send JSON payload with one personalization per recipient in chunk."""
+        personalizations = [
+            _personalization(r["email"], r.get("name", "Customer"), campaign_id, variant) for r in chunk
+        ]
+        return _build_payload(
+            self._from, personalizations,
+            subject, html_body, body, sandbox=self.sandbox,
+        )
+    
+    @staticmethod
+    def _chunk_failure(chunk: List[Dict[str, str]], error: str, status_code: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Failed per_recipient rows for every recipient of a chunk."""
+        return [
+            {"email": r["email"], "success": False, "message_id": None, "status_code": status_code, "error": error}
+            for r in chunk
+        ]
+    
+    def _chunk_results(self, chunk: List[Dict[str, str]], status_code: int, batch_message_id: str,
+                       variant: str, campaign_id: str) -> List[Dict[str, Any]]:
+        """
+        Per-recipient rows for a chunk request, recording derived message IDs.
+        
+        Rows have the send_batch per_recipient shape (email, success, message_id,
+        status_code, error) so they are used as-is in the batch results.
+        """
+        if status_code not in [200, 202]:
+            logger.error(f"❌ SendGrid returned non-success status {status_code} for a batch of {len(chunk)} emails")
+            return self._chunk_failure(chunk, f"SendGrid returned status {status_code}", status_code)
+        
+        logger.info(f"✅ {len(chunk)} emails accepted by SendGrid (Status: {status_code})")
+        rows = []
+        new_ids = {}  # recipient_email -> message_id
+        for index, recipient in enumerate(chunk):
+            email = recipient["email"]
+            # Per-recipient IDs derived from the request's X-Message-Id
+            message_id = f"{batch_message_id}.{index}" if batch_message_id else ""
+            if message_id:
+                new_ids[email] = message_id
+            rows.append({"email": email, "success": True, "message_id": message_id,
+                         "status_code": status_code, "error": None})
+        self.message_store.record(campaign_id, variant, new_ids)
+        return rows
+    
     def send_batch(self, recipients: List[Dict[str, str]], email_content: Dict[str, Any],
                    variant: str = "A", campaign_id: str = "") -> Dict[str, Any]:
         """
         Send batch emails via SendGrid.
         
+        Recipients are sent in chunks of up to MAX_PERSONALIZATIONS, each chunk
+        as a single API request with one personalization per recipient.
+        
         Args:
             recipients: List of recipient dictionaries
             email_content: Email content dictionary
@@ -181,6 +363,27 @@ class SendGridSender:
         Returns:
             Dictionary with batch send results
         """
+        results, chunks, subject, body = self._start_batch(recipients, email_content, variant)
+        if chunks:
+            html_body = self._html_body(body)
+            if len(chunks) > 1 and self.max_workers > 1:
+                # Requests are network-bound; overlap them, keeping results in chunk order
+                with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as executor:
+                    all_results = list(executor.map(
+                        lambda c: self._send_chunk(c, subject, html_body, body, variant, campaign_id), chunks
+                    ))
+            else:
+                all_results = [self._send_chunk(c, subject, html_body, body, variant, campaign_id) for c in chunks]
+            self._finish_batch(results, all_results)
+        return results
+    
+    def _start_batch(self, recipients: List[Dict[str, str]], email_content: Dict[str, Any], variant: str) -> tuple:
+        """
+        Validate batch input and split recipients into request-sized chunks.
+        
+        Returns:
+            (results, chunks, subject, body); chunks is empty when there is nothing to send
+        """
         logger.info(f"📦 Starting batch send: {len(recipients)} recipients, variant {variant}")
         
         results = {
@@ -195,7 +398,7 @@ class SendGridSender:
         
         if not recipients:
             logger.error("❌ No recipients provided for batch send")
-            return results
+            return results, [], "", ""
         
         # Stronger content fallback
         subject = (email_content.get("subject") or "").strip() or "Update from our team"
@@ -207,57 +410,47 @@ class SendGridSender:
         if not subject or not body:
             logger.error(f"❌ Missing email content - Subject: {bool(subject)}, Body: {bool(body)}")
             results["errors"].append({"error": "Missing email subject or body"})
-            return results
+            return results, [], subject, body
         
         logger.info(f"📧 Sending emails with subject: {subject[:50]}...")
         
+        valid_recipients = []
         for i, recipient in enumerate(recipients):
-            email = recipient.get("email", "")
-            name = recipient.get("name", "Customer")
-            
-            if not email:
+            if not recipient.get("email", ""):
                 logger.warning(f"⚠️ Skipping recipient {i+1}: No email address")
                 results["failed"] += 1
                 results["errors"].append({"email": "N/A", "error": "No email address"})
                 continue
-            
-            logger.info(f"📨 Sending email {i+1}/{len(recipients)} to {email}")
-            result = self.send_email(email, name, subject, body, variant, campaign_id)
-            
-            results["per_recipient"].append({
-                "email": email,
-                "success": bool(result.get("success")),
-                "message_id": result.get("message_id"),
-                "status_code": result.get("status_code"),
-                "error": result.get("error"),
-            })
-
-            if result.get("success"):
-                results["sent"] += 1
-                if result.get("message_id"):
-                    results["message_ids"].append({
-                        "email": email,
-                        "message_id": result["message_id"]
-                    })
-                logger.info(f"✅ Email {i+1} sent successfully to {email}")
+            valid_recipients.append(recipient)
+        
+        # One mail/send request per chunk, one personalization per recipient
+        chunks = [
+            valid_recipients[start:start + MAX_PERSONALIZATIONS]
+            for start in range(0, len(valid_recipients), MAX_PERSONALIZATIONS)
+        ]
+        return results, chunks, subject, body
+    
+    def _finish_batch(self, results: Dict[str, Any], all_results: List[List[Dict[str, Any]]]) -> None:
+        """Fold per-chunk rows (in chunk order) into the batch results dict."""
+        per_recipient = results["per_recipient"]
+        for rows in all_results:
+            if not rows:
+                continue
+            per_recipient.extend(rows)
+            # A chunk is one request, so its recipients all succeed or all fail together
+            if rows[0]["success"]:
+                results["sent"] += len(rows)
+                results["message_ids"].extend(
+                    {"email": row["email"], "message_id": row["message_id"]} for row in rows if row["message_id"]
+                )
             else:
-                results["failed"] += 1
-                error_msg = result.get("error", "Unknown error")
-                results["errors"].append({
-                    "email": email,
-                    "error": error_msg
-                })
-                logger.error(f"❌ Email {i+1} failed to {email}: {error_msg}")
+                results["failed"] += len(rows)
+                error_msg = rows[0]["error"] or "Unknown error"
+                results["errors"].extend({"email": row["email"], "error": row["error"] or "Unknown error"} for row in rows)
+                logger.error(f"❌ {len(rows)} emails failed ({rows[0]['email']}...): {error_msg}")
         
         logger.info(f"📊 Batch send complete: {results['sent']} sent, {results['failed']} failed out of {results['total']} total")
-        return results
     
     def get_message_ids(self, campaign_id: str, variant: str) -> List[str]:
         """Get all message IDs for a campaign variant."""
-        message_ids = []
-        prefix = f"{campaign_id}_{variant}_"
-        for key, msg_id in self.message_ids.items():
-            if key.startswith(prefix):
-                message_ids.append(msg_id)
-        return message_ids
-
+        return self.message_store.get(campaign_id, variant)
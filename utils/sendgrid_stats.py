@@ -2,9 +2,17 @@
 from __future__ import annotations
 
 import datetime as dt
-from typing import Any, Dict, List, Optional
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
 import requests
 
+# Shared across instances (callers construct a SendGridStats per request):
+# (api_key, start_date, end_date, aggregated_by) -> (etag, stats)
+_STATS_CACHE: "OrderedDict[Tuple[str, str, str, str], Tuple[Optional[str], Tuple[Dict[str, Any], ...]]]" = OrderedDict()
+_STATS_CACHE_MAXSIZE = 256
+_STATS_CACHE_LOCK = threading.Lock()
+
 class SendGridStats:
     BASE_URL = "https://api.sendgrid.com/v3"
 
@@ -32,16 +40,41 @@ class SendGridStats:
         """
         GET /v3/stats
         Docs: https://docs.sendgrid.com/api-reference/stats
+
+        Responses are cached per date range: ranges ending before today (UTC)
+        are served from the cache, others are revalidated with If-None-Match.
         """
         params = {
             "start_date": self._date(start_date),
             "end_date": self._date(end_date),
             "aggregated_by": aggregated_by,
         }
+        key = (self.api_key, params["start_date"], params["end_date"], aggregated_by)
+        with _STATS_CACHE_LOCK:
+            cached = _STATS_CACHE.get(key)
+            if cached is not None:
+                _STATS_CACHE.move_to_end(key)
+
+        # SendGrid buckets stats by UTC day; days before today (UTC) are final,
+        # so a cached range ending before then never changes
+        today_utc = dt.datetime.now(dt.timezone.utc).date().strftime("%Y-%m-%d")
+        if cached is not None and params["end_date"] < today_utc:
+            return list(cached[1])
+
+        headers = {"If-None-Match": cached[0]} if cached is not None and cached[0] else None
         url = f"{self.BASE_URL}/stats"
-        resp = self.session.get(url, params=params, timeout=30)
+        resp = self.session.get(url, params=params, headers=headers, timeout=30)
+        if resp.status_code == 304 and cached is not None:
+            return list(cached[1])
         resp.raise_for_status()
-        return resp.json() or []
+        data = resp.json() or []
+
+        with _STATS_CACHE_LOCK:
+            _STATS_CACHE[key] = (resp.headers.get("ETag"), tuple(data))
+            _STATS_CACHE.move_to_end(key)
+            while len(_STATS_CACHE) > _STATS_CACHE_MAXSIZE:
+                _STATS_CACHE.popitem(last=False)
+        return data
 
     @staticmethod
     def to_dataframe(data: List[Dict[str, Any]]):
@@ -51,22 +84,17 @@ class SendGridStats:
             raise RuntimeError("pandas is required to format SendGrid stats") from e
 
         # Expected shape: [{"date": "YYYY-MM-DD", "stats": [{"metrics": {...}}]}]
-        rows: List[Dict[str, Any]] = []
-        for item in data:
-            date = item.get("date")
-            stats_list = item.get("stats", []) or []
-            # Each 'stats' element can include 'metrics' and possible grouping data
-            for s in stats_list:
-                metrics = s.get("metrics", {}) or {}
-                row = {"date": date}
-                row.update(metrics)
-                rows.append(row)
-        if not rows:
+        # Each 'stats' element can include 'metrics' and possible grouping data
+        items = [item for item in data if item.get("stats")]
+        if not items:
             return pd.DataFrame(columns=["date"])
-        df = pd.DataFrame(rows)
+        flat = pd.json_normalize(items, record_path="stats", meta=["date"], errors="ignore")
+        metric_cols = [c for c in flat.columns if c.startswith("metrics.")]
+        df = flat[["date"] + metric_cols].set_axis(
+            ["date"] + [c[len("metrics."):] for c in metric_cols], axis=1
+        )
         # Deduplicate by date if multiple groups present (sum numeric columns)
-        if "date" in df.columns and len(df) > 0:
-            num_cols = df.select_dtypes(include=["number"]).columns.tolist()
-            if num_cols:
-                df = df.groupby("date", as_index=False)[num_cols].sum()
+        num_cols = df.select_dtypes(include=["number"]).columns.tolist()
+        if num_cols:
+            df = df.groupby("date", as_index=False)[num_cols].sum()
         return df
@@ -6,6 +6,7 @@ from datetime import datetime, timedelta
 import logging
 import time
 import os
+import numpy as np
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -202,18 +203,22 @@ class SendGridTracker:
         Returns:
             Dictionary of simulated activities
         """
-        import random
-        activities = {}
-        
-        for msg_id in message_ids:
-            activities[msg_id] = {
+        # Draw all random outcomes at once rather than four random() calls per message
+        rng = np.random.default_rng()
+        n = len(message_ids)
+        delivered = (rng.random(n) > 0.05).tolist()  # 95% delivery rate
+        opened = (rng.random(n) < open_rate).tolist()
+        clicked = (rng.random(n) < click_rate).tolist()
+        bounced = (rng.random(n) < 0.02).tolist()  # 2% bounce rate
+        
+        return {
+            msg_id: {
                 "sent": True,
-                "delivered": random.random() > 0.05,  # 95% delivery rate
-                "opened": random.random() < open_rate,
-                "clicked": random.random() < click_rate,
-                "bounced": random.random() < 0.02,  # 2% bounce rate
+                "delivered": delivered[i],
+                "opened": opened[i],
+                "clicked": clicked[i],
+                "bounced": bounced[i],
                 "spam_report": False
             }
-        
-        return activities
-
+            for i, msg_id in enumerate(message_ids)
+        }
@@ -3,15 +3,32 @@ SendGrid Webhook Handler for Email Activity Tracking
 Receives webhook events from SendGrid and logs activities to CSV.
 """
 from flask import Flask, request, jsonify
+from flask.json.provider import DefaultJSONProvider
 from utils.user_activity_tracker import UserActivityTracker
+from utils import json_utils
 import config
 import logging
-import json
+
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    IJSON_AVAILABLE = False
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class JSONUtilsProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by json_utils (orjson when installed)."""
+
+    def dumps(self, obj, **kwargs):
+        return json_utils.dumps(obj, sort_keys=kwargs.get("sort_keys", False))
+
+    def loads(self, s, **kwargs):
+        return json_utils.loads(s)
+
 app = Flask(__name__)
+app.json = JSONUtilsProvider(app)
 activity_tracker = UserActivityTracker(config.DATA_DIR)
 
 @app.route('/webhook/sendgrid', methods=['POST'])
@@ -22,17 +39,42 @@ def sendgrid_webhook():
     Expected events: processed, delivered, open, click, bounce, etc.
     """
     try:
+        if IJSON_AVAILABLE and request.content_length is not None:
+            body = _BodyReader(request.environ['wsgi.input'], request.content_length)
+            if body.peek() == b'[':
+                # Parse events as the body arrives instead of buffering it whole;
+                # rows are written only once the whole array has parsed, so a
+                # rejected body (which SendGrid retries) leaves nothing behind
+                try:
+                    count, activities = _stream_events(body)
+                except (ValueError, ijson.JSONError) as e:
+                    logger.warning(f"Invalid JSON in webhook: {e}")
+                    count = 0
+                if not count:
+                    logger.warning("No JSON data received in webhook")
+                    return jsonify({"status": "error", "message": "No data"}), 400
+                logger.info(f"Received SendGrid webhook: {count} events")
+                activity_tracker.log_batch_activities(activities)
+                return jsonify({"status": "success"}), 200
+            # Not an array: handled exactly like a buffered body
+            raw = body.read()
+        else:
+            raw = request.get_data(cache=False)
+
         # Get the raw data
-        data = request.get_json(silent=True)
+        try:
+            data = json_utils.loads(raw)
+        except ValueError:
+            data = None
         if not data:
             logger.warning("No JSON data received in webhook")
             return jsonify({"status": "error", "message": "No data"}), 400
 
         logger.info(f"Received SendGrid webhook: {len(data)} events")
 
-        # Process each event
-        for event in data:
-            process_sendgrid_event(event)
+        # Process each event, then append all resulting rows in one write
+        activities = [a for a in map(process_sendgrid_event, data) if a]
+        activity_tracker.log_batch_activities(activities)
 
         return jsonify({"status": "success"}), 200
 
@@ -40,58 +82,134 @@ def sendgrid_webhook():
         logger.error(f"Error processing SendGrid webhook: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+class _BodyReader:
+    """Raw request body limited to Content-Length, for ijson.
+
+    ijson probes its input with read(0); werkzeug's request.stream treats an
+    empty read as a client disconnect, so the WSGI input is read directly.
+    """
+
+    def __init__(self, stream, length: int):
+        self._stream = stream
+        self._remaining = length
+        self._buffer = b''  # bytes consumed by peek() but not yet read()
+
+    def peek(self) -> bytes:
+        """Return the first non-whitespace byte of the body without consuming it."""
+        while not self._buffer:
+            data = self._read(8192)
+            if not data:
+                return b''
+            self._buffer = data.lstrip()
+        return self._buffer[:1]
+
+    def read(self, size: int = -1) -> bytes:
+        if self._buffer:
+            if size < 0:
+                data, self._buffer = self._buffer + self._read(-1), b''
+            else:
+                data, self._buffer = self._buffer[:size], self._buffer[size:]
+            return data
+        return self._read(size)
+
+    def _read(self, size: int) -> bytes:
+        if size == 0 or self._remaining <= 0:
+            return b''
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._stream.read(size)
+        self._remaining = self._remaining - len(data) if data else 0
+        return data
+
+def _stream_events(stream):
+    """
+    Incrementally parse a JSON array of events into activity rows.
+
+    Args:
+        stream: File-like request body
+
+    Returns:
+        Tuple of (number of events parsed, activity rows to log)
+    """
+    count = 0
+    activities = []
+    for event in ijson.items(stream, "item", use_float=True):
+        count += 1
+        activity = process_sendgrid_event(event)
+        if activity:
+            activities.append(activity)
+    return count, activities
+
+def _event_identity(event):
+    """Return (campaign_id, variant, recipient_email) from an event's custom args."""
+    custom_args = event.get('custom_args', {})
+    return (
+        custom_args.get('campaign_id', 'unknown'),
+        custom_args.get('variant', 'unknown'),
+        custom_args.get('recipient_email', event.get('email')),  # Fallback to event email
+    )
+
+def _log_engagement(event):
+    """Activity row for an open/click event."""
+    event_type = event.get('event')
+    campaign_id, variant, recipient_email = _event_identity(event)
+    logger.info(f"Logged {event_type} activity: Campaign {campaign_id}, Variant {variant}, Email {recipient_email}")
+    return {
+        "campaign_id": campaign_id,
+        "variant": variant,
+        "email": recipient_email,
+        "action": event_type,
+        "details": f"SendGrid event: {json_utils.dumps(event)}",
+    }
+
+def _log_bounce(event):
+    """Activity row for a bounce/dropped event."""
+    event_type = event.get('event')
+    campaign_id, variant, recipient_email = _event_identity(event)
+    logger.warning(f"Email {event_type}: {recipient_email}")
+    return {
+        "campaign_id": campaign_id,
+        "variant": variant,
+        "email": recipient_email,
+        "action": 'bounce',
+        "details": f"SendGrid event: {event_type} - {json_utils.dumps(event)}",
+    }
+
+def _log_delivered(event):
+    """Delivery confirmations are only logged, not written to CSV."""
+    logger.info(f"Email delivered: {_event_identity(event)[2]}")
+    return None
+
+# Event type -> handler returning an activity row (or None)
+_HANDLERS = {
+    'open': _log_engagement,
+    'click': _log_engagement,
+    'bounce': _log_bounce,
+    'dropped': _log_bounce,
+    'delivered': _log_delivered,
+}
+
 def process_sendgrid_event(event):
     """
-    Process a single SendGrid event and log to CSV.
+    Process a single SendGrid event into an activity row.
 
     Args:
         event: SendGrid event dictionary
+
+    Returns:
+        Activity dict for UserActivityTracker.log_batch_activities, or None if
+        the event is not logged to CSV
     """
     try:
-        event_type = event.get('event')
-        email = event.get('email')
-        timestamp = event.get('timestamp')
-
-        # Extract custom args (campaign_id, variant, recipient_email)
-        custom_args = event.get('custom_args', {})
-
-        campaign_id = custom_args.get('campaign_id', 'unknown')
-        variant = custom_args.get('variant', 'unknown')
-        recipient_email = custom_args.get('recipient_email', email)  # Fallback to event email
-
-        # Log based on event type
-        if event_type in ['open', 'click']:
-            # Log the activity
-            activity_tracker.log_activity(
-                campaign_id=campaign_id,
-                variant=variant,
-                email=recipient_email,
-                action=event_type,
-                details=f"SendGrid event: {json.dumps(event)}"
-            )
-
-            logger.info(f"Logged {event_type} activity: Campaign {campaign_id}, Variant {variant}, Email {recipient_email}")
-
-        elif event_type == 'delivered':
-            # Could log delivery confirmation if needed
-            logger.info(f"Email delivered: {recipient_email}")
-
-        elif event_type in ['bounce', 'dropped']:
-            # Log bounce/dropped events
-            activity_tracker.log_activity(
-                campaign_id=campaign_id,
-                variant=variant,
-                email=recipient_email,
-                action='bounce',
-                details=f"SendGrid event: {event_type} - {json.dumps(event)}"
-            )
-            logger.warning(f"Email {event_type}: {recipient_email}")
-
-        else:
-            logger.debug(f"Ignored event type: {event_type}")
+        handler = _HANDLERS.get(event.get('event'))
+        if handler is None:
+            logger.debug("Ignored event type: %s", event.get('event'))
+            return None
+        return handler(event)
 
     except Exception as e:
         logger.error(f"Error processing SendGrid event: {str(e)} - Event: {event}")
+    return None
 
 @app.route('/health')
 def health_check():
@@ -99,9 +217,7 @@ def health_check():
     return {"status": "healthy", "service": "sendgrid-webhook"}
 
 if __name__ == '__main__':
-    # Run the webhook handler
-    app.run(
-        host='0.0.0.0',
-        port=5002,  # Different port from tracking server
-        debug=False
-    )
+    # Run the webhook handler on a multi-threaded WSGI server rather than the
+    # single-threaded Flask dev server (see run_webhook_handler.py for options)
+    from waitress import serve
+    serve(app, host='0.0.0.0', port=5002, threads=16)  # Different port from tracking server
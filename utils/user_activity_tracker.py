@@ -1,26 +1,231 @@
+import array
+import atexit
 import csv
+import io
+import math
+import mmap
 import os
+import threading
+import weakref
+import random
+import re
+import time
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, Iterator, List, Any, Optional
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Timestamps are written as integer nanoseconds since the epoch (time.time_ns());
+# logs created before this keep their ISO 'timestamp' column and format
+_CSV_HEADER = ['timestamp_ns', 'campaign_id', 'variant', 'email', 'action', 'details']
+
+# Characters that make csv.writer quote a field (delimiter, quote, line terminator)
+_NEEDS_QUOTING = re.compile(r'[",\r\n]').search
+
+# Constant tail of the rows log_opens_and_clicks_from_metrics writes
+_OPEN_SUFFIX = b',open,tracked via SendGrid\r\n'
+_CLICK_SUFFIX = b',click,tracked via SendGrid\r\n'
+
+# get_activities results kept per filter pair, each tagged with the file's mtime and size
+_QUERY_CACHE_SIZE = 128
+
+# Read buffer for sequential scans of the activity log (writes are unbuffered appends)
+_SCAN_BUFFER_SIZE = 1 << 20
+
+# Trackers with a possibly open descriptor; held weakly so they can still be collected
+_open_trackers: "weakref.WeakSet[UserActivityTracker]" = weakref.WeakSet()
+
+@atexit.register
+def _close_open_trackers():
+    for tracker in list(_open_trackers):
+        tracker.close()
+
+def iso_timestamp(ns: int) -> str:
+    """
+    Render an epoch-nanosecond timestamp as a local ISO 8601 string for display.
+
+    Args:
+        ns: Nanoseconds since the epoch (int or digit string, as read from the CSV)
+
+    Returns:
+        ISO 8601 timestamp with microsecond precision
+    """
+    seconds, rem = divmod(int(ns), 1_000_000_000)
+    return datetime.fromtimestamp(seconds).replace(microsecond=rem // 1000).isoformat()
+
+def _to_ns(ts) -> int:
+    """Convert a caller-supplied timestamp (epoch ns, digit string or ISO string) to epoch ns."""
+    if isinstance(ts, str):
+        if ts.isdigit():
+            return int(ts)
+        dt = datetime.fromisoformat(ts)
+        return int(dt.timestamp()) * 1_000_000_000 + dt.microsecond * 1000
+    return int(ts)
+
+def _sample_indices(population, k: int) -> array.array:
+    """Pick k distinct items of an index sequence by reservoir sampling (Algorithm L).
+
+    Only the k-slot reservoir is allocated, as a compact array of ints, and
+    the number of random draws grows with k rather than with the population.
+
+    Args:
+        population: Sequence of indices, e.g. range(n) or an earlier sample
+        k: Number of indices to pick (clamped to the population size)
+
+    Returns:
+        array.array('i') of the picked indices, in no particular order
+    """
+    n = len(population)
+    k = max(0, min(k, n))
+    reservoir = array.array('i', population[:k])
+    if k == 0 or k == n:
+        return reservoir
+    w = math.exp(math.log(1.0 - random.random()) / k)
+    i = k - 1
+    while True:
+        i += math.floor(math.log(1.0 - random.random()) / math.log(1.0 - w)) + 1
+        if i >= n:
+            return reservoir
+        reservoir[random.randrange(k)] = population[i]
+        w *= math.exp(math.log(1.0 - random.random()) / k)
+
+def _distribute_engagement(total_recipients: int, opened_count: int, clicked_count: int):
+    """
+    Randomly pick which recipients opened and which of those clicked.
+
+    Positions are sampled rather than the recipient dicts, so selection never
+    depends on dict equality and callers only visit the chosen recipients.
+
+    Args:
+        total_recipients: Number of recipients
+        opened_count: Opens reported by SendGrid
+        clicked_count: Clicks reported by SendGrid
+
+    Returns:
+        (opened, clicked): sorted opened positions and a container of clicked positions
+    """
+    # Clicks are drawn from the opened recipients, so no opens means nothing
+    # to log (the usual case before SendGrid has populated the metrics)
+    if total_recipients == 0 or opened_count <= 0:
+        return range(0), range(0)
+    # Sampling a whole population is a no-op, so that case skips it
+    if opened_count >= total_recipients:
+        opened_idx = range(total_recipients)
+    else:
+        opened_idx = sorted(_sample_indices(range(total_recipients), opened_count))
+    if clicked_count >= len(opened_idx):
+        return opened_idx, opened_idx
+    return opened_idx, set(_sample_indices(opened_idx, clicked_count))
+
+def _csv_field(value) -> bytes:
+    """Encode one CSV field exactly as csv.writer would (minimal quoting)."""
+    value = '' if value is None else str(value)
+    if _NEEDS_QUOTING(value):
+        value = '"' + value.replace('"', '""') + '"'
+    return value.encode('utf-8')
+
+def _read_record(f) -> Optional[bytes]:
+    """Read one CSV record from a binary file; quoted fields may span lines."""
+    record = f.readline()
+    # csv doubles embedded quotes, so a complete record has an even number of them
+    while record and record.count(b'"') % 2:
+        more = f.readline()
+        if not more:
+            break
+        record += more
+    return record or None
+
+def _parse_record(record: bytes) -> List[str]:
+    """Parse one raw CSV record into its fields."""
+    return next(csv.reader(io.StringIO(record.decode('utf-8'), newline='')), [])
+
 class UserActivityTracker:
     """Tracks user activities like opens and clicks in a CSV file."""
 
     def __init__(self, data_dir: str):
         self.data_dir = data_dir
         self.csv_path = os.path.join(data_dir, "user_activity.csv")
+        self._fd = None  # O_APPEND descriptor, opened on first write and kept open
+        self._fd_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        # campaign_id -> byte offsets of its rows; extended incrementally from
+        # _indexed_upto so rows appended by other processes are picked up too
+        self._index: Dict[str, List[int]] = {}
+        self._indexed_upto = 0
+        self._header: List[str] = []
+        self._index_lock = threading.Lock()
+        self._query_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._query_cache_lock = threading.Lock()
         self._ensure_csv_exists()
+        # Column names as the file has them (a pre-existing log may use 'timestamp')
+        with open(self.csv_path, 'rb') as f:
+            self._columns = _parse_record(f.readline()) or list(_CSV_HEADER)
+        self._epoch_timestamps = self._columns[0] != 'timestamp'
+        _open_trackers.add(self)
 
     def _ensure_csv_exists(self):
         """Ensure the CSV file exists with headers."""
         if not os.path.exists(self.csv_path):
             with open(self.csv_path, 'w', newline='') as csvfile:
                 writer = csv.writer(csvfile)
-                writer.writerow(['timestamp', 'campaign_id', 'variant', 'email', 'action', 'details'])
+                writer.writerow(_CSV_HEADER)
+
+    def _format_timestamp(self, ts) -> str:
+        """Render a timestamp in the format of this log's timestamp column."""
+        ns = _to_ns(ts)
+        return str(ns) if self._epoch_timestamps else iso_timestamp(ns)
+
+    def _get_fd(self) -> int:
+        """Return the cached O_APPEND descriptor for the CSV, opening it on first use."""
+        if self._fd is None:
+            with self._fd_lock:
+                if self._fd is None:
+                    self._fd = os.open(self.csv_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, 'O_CLOEXEC', 0), 0o644)
+        return self._fd
+
+    def _append(self, data: bytes):
+        """Append raw bytes to the CSV through the shared O_APPEND file descriptor.
+
+        The data normally goes out in one write() at the end of the file. Threads
+        of this tracker are serialized by a lock, so a short write is finished
+        before another thread appends. Across processes, POSIX does not promise
+        that a write to a regular file is atomic (PIPE_BUF only applies to
+        pipes). Local Linux filesystems do not split such appends in practice,
+        but a short write (e.g. a full disk) could let another process's rows
+        land in between.
+        """
+        fd = self._get_fd()
+        view = memoryview(data)
+        with self._write_lock:
+            while view:
+                written = os.write(fd, view)
+                view = view[written:]
+
+    def flush(self):
+        """Force everything written so far to disk."""
+        if self._fd is not None:
+            os.fsync(self._fd)
+
+    def close(self):
+        """Close the cached file descriptor; writing again afterwards reopens the file."""
+        with self._fd_lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __del__(self):
+        # The fd is a raw descriptor, so close it when an unclosed tracker is collected
+        if getattr(self, '_fd', None) is not None:
+            os.close(self._fd)
 
     def log_activity(self, campaign_id: str, variant: str, email: str, action: str, details: str = ""):
         """
@@ -33,10 +238,11 @@ class UserActivityTracker:
             action: Action type (open, click, etc.)
             details: Additional details
         """
-        timestamp = datetime.now().isoformat()
-        with open(self.csv_path, 'a', newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow([timestamp, campaign_id, variant, email, action, details])
+        buf = io.StringIO()
+        csv.writer(buf).writerow(
+            (self._format_timestamp(time.time_ns()), campaign_id, variant, email, action, details)
+        )
+        self._append(buf.getvalue().encode('utf-8'))
         logger.info(f"Logged activity: {action} for {email} in campaign {campaign_id}")
 
     def log_batch_activities(self, activities: List[Dict[str, Any]]):
@@ -45,40 +251,184 @@ class UserActivityTracker:
 
         Args:
             activities: List of activity dicts with keys: campaign_id, variant, email, action, details
+                and optionally timestamp (epoch ns or ISO string; defaults to the time the batch is written)
         """
-        with open(self.csv_path, 'a', newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            for activity in activities:
-                timestamp = datetime.now().isoformat()
-                writer.writerow([
-                    timestamp,
-                    activity.get('campaign_id', ''),
-                    activity.get('variant', ''),
-                    activity.get('email', ''),
-                    activity.get('action', ''),
-                    activity.get('details', '')
-                ])
-        logger.info(f"Logged {len(activities)} activities")
-
-    def get_activities(self, campaign_id: str = None, email: str = None) -> List[Dict[str, Any]]:
+        if not activities:
+            return
+        # Render the whole batch first, then append it with a single O_APPEND
+        # write so rows from concurrent writers (e.g. several server workers) stay whole
+        now = self._format_timestamp(time.time_ns())  # one timestamp for the whole batch
+        rows = [
+            (
+                self._format_timestamp(activity['timestamp']) if activity.get('timestamp') else now,
+                activity.get('campaign_id', ''),
+                activity.get('variant', ''),
+                activity.get('email', ''),
+                activity.get('action', ''),
+                activity.get('details', '')
+            )
+            for activity in activities
+        ]
+        # writerows runs the per-row loop (quoting included) inside the C csv module
+        buf = io.StringIO()
+        csv.writer(buf).writerows(rows)
+        self._append(buf.getvalue().encode('utf-8'))
+        logger.info("Logged %d activities", len(activities))
+
+    def _refresh_index(self):
+        """Index rows appended since the last refresh (rebuilding if the file shrank)."""
+        with self._index_lock:
+            size = os.path.getsize(self.csv_path)
+            if size < self._indexed_upto:
+                self._index, self._indexed_upto, self._header = {}, 0, []
+            if size == self._indexed_upto:
+                return
+            with open(self.csv_path, 'rb', buffering=_SCAN_BUFFER_SIZE) as f:
+                if self._indexed_upto == 0:
+                    header = _read_record(f)
+                    if not header or not header.endswith(b'\n'):
+                        return
+                    self._header = _parse_record(header)
+                    self._indexed_upto = f.tell()
+                else:
+                    f.seek(self._indexed_upto)
+                campaign_col = self._header.index('campaign_id')
+                while True:
+                    offset = f.tell()
+                    record = _read_record(f)
+                    # Stop at EOF or at a row another writer has not finished yet
+                    if not record or not record.endswith(b'\n'):
+                        break
+                    self._indexed_upto = f.tell()
+                    row = _parse_record(record)
+                    if len(row) > campaign_col:
+                        self._index.setdefault(row[campaign_col], []).append(offset)
+
+    def _iter_indexed(self, campaign_id: str) -> Iterator[List[str]]:
+        """Yield the raw rows of one campaign by seeking to their indexed offsets."""
+        with self._index_lock:
+            offsets = list(self._index.get(campaign_id, ()))
+        if not offsets:
+            return
+        with open(self.csv_path, 'rb') as f:
+            for offset in offsets:
+                f.seek(offset)
+                yield _parse_record(_read_record(f))
+
+    def _iter_scanned(self, email: str = None) -> Iterator[List[str]]:
+        """Yield the header, then every raw row, from a full scan of the memory-mapped CSV.
+
+        Records are split on the raw bytes. With email set, rows without
+        quoting whose email field does not match are skipped before being
+        decoded; quoted rows go through the csv module as before.
+        """
+        with open(self.csv_path, 'rb') as f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # an empty file cannot be mapped
+                return
+        with mm:
+            end = len(mm)
+            pos = 0
+            header = None
+            email_col = target = None
+            while pos < end:
+                newline = mm.find(b'\n', pos)
+                stop = end if newline < 0 else newline + 1
+                record = mm[pos:stop]
+                # csv doubles embedded quotes, so an odd count means a quoted field spans lines
+                while record.count(b'"') % 2 and stop < end:
+                    newline = mm.find(b'\n', stop)
+                    more_stop = end if newline < 0 else newline + 1
+                    record += mm[stop:more_stop]
+                    stop = more_stop
+                pos = stop
+                if header is None:
+                    header = _parse_record(record)
+                    if email and 'email' in header:
+                        email_col, target = header.index('email'), email.encode('utf-8')
+                    yield header
+                elif b'"' in record:
+                    yield _parse_record(record)
+                else:
+                    fields = record.rstrip(b'\r\n').split(b',')
+                    if fields == [b'']:
+                        continue
+                    if email_col is not None and (len(fields) <= email_col or fields[email_col] != target):
+                        continue
+                    yield [field.decode('utf-8') for field in fields]
+
+    def iter_activities(self, campaign_id: str = None, email: str = None, as_tuple: bool = False) -> Iterator[Any]:
+        """
+        Stream activities from the CSV one row at a time, optionally filtered.
+
+        Memory stays flat regardless of file size, and callers can stop early
+        (e.g. with next() or any()). Filtering by campaign_id reads only that
+        campaign's rows via an in-memory offset index instead of the whole file.
+
+        Args:
+            campaign_id: Filter by campaign ID
+            email: Filter by email
+            as_tuple: Yield raw row tuples (in CSV column order) instead of dicts
+
+        Yields:
+            Activity dictionaries (or tuples when as_tuple is set)
+        """
+        if campaign_id:
+            self._refresh_index()
+            rows = self._iter_indexed(campaign_id)
+            header = self._header
+        else:
+            rows = self._iter_scanned(email)
+            header = next(rows, None)
+        if not header:
+            return
+        email_col = header.index('email')
+        width = len(header)
+        for row in rows:
+            if not row:
+                continue
+            if len(row) < width:
+                row += [None] * (width - len(row))
+            # Filter on the raw row; only matching rows are turned into dicts
+            if email and row[email_col] != email:
+                continue
+            yield tuple(row) if as_tuple else dict(zip(header, row))
+
+    def get_activities(self, campaign_id: str = None, email: str = None, as_tuple: bool = False) -> List[Any]:
         """
         Get activities from CSV, optionally filtered.
 
         Args:
             campaign_id: Filter by campaign ID
             email: Filter by email
+            as_tuple: Return raw row tuples (in CSV column order) instead of dicts
 
         Returns:
-            List of activity dictionaries
+            List of activity dictionaries (or tuples when as_tuple is set)
         """
-        activities = []
-        with open(self.csv_path, 'r') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                if (not campaign_id or row['campaign_id'] == campaign_id) and \
-                   (not email or row['email'] == email):
-                    activities.append(row)
-        return activities
+        # The log is append-only, so unchanged mtime and size mean an unchanged answer
+        st = os.stat(self.csv_path)
+        key = (campaign_id, email)
+        stamp = (st.st_mtime_ns, st.st_size)
+        rows = None
+        with self._query_cache_lock:
+            cached = self._query_cache.get(key)
+            if cached is not None and cached[0] == stamp:
+                rows = cached[1]
+                self._query_cache.move_to_end(key)
+        if rows is None:
+            rows = tuple(self.iter_activities(campaign_id, email, as_tuple=True))
+            with self._query_cache_lock:
+                # One entry per query: a stale snapshot is replaced, not kept alongside
+                self._query_cache[key] = (stamp, rows)
+                self._query_cache.move_to_end(key)
+                while len(self._query_cache) > _QUERY_CACHE_SIZE:
+                    self._query_cache.popitem(last=False)
+        if as_tuple:
+            return list(rows)
+        header = self._header or self._columns
+        return [dict(zip(header, row)) for row in rows]
 
     def log_opens_and_clicks_from_metrics(self, campaign_id: str, variant: str, recipients: List[Dict[str, str]], metrics: Dict[str, Any]):
         """
@@ -92,36 +442,23 @@ class UserActivityTracker:
             recipients: List of recipient dicts
             metrics: Metrics dict with opened, clicked counts
         """
-        opened_count = metrics.get('opened', 0)
-        clicked_count = metrics.get('clicked', 0)
-        total_recipients = len(recipients)
-
-        if total_recipients == 0:
+        opened_idx, clicked_idx = _distribute_engagement(
+            len(recipients), metrics.get('opened', 0), metrics.get('clicked', 0)
+        )
+        if not opened_idx:
             return
 
-        # Simple distribution: randomly assign opens/clicks to recipients
-        import random
-        opened_recipients = random.sample(recipients, min(opened_count, total_recipients))
-        clicked_recipients = random.sample(opened_recipients, min(clicked_count, len(opened_recipients)))
-
-        activities = []
-        for recipient in recipients:
-            email = recipient.get('email', '')
-            if recipient in opened_recipients:
-                activities.append({
-                    'campaign_id': campaign_id,
-                    'variant': variant,
-                    'email': email,
-                    'action': 'open',
-                    'details': 'tracked via SendGrid'
-                })
-            if recipient in clicked_recipients:
-                activities.append({
-                    'campaign_id': campaign_id,
-                    'variant': variant,
-                    'email': email,
-                    'action': 'click',
-                    'details': 'tracked via SendGrid'
-                })
-
-        self.log_batch_activities(activities)
+        # Every row shares the timestamp, campaign and variant, and ends in one of
+        # two fixed suffixes, so encode those once and join bytes per recipient
+        prefix = b''.join((
+            self._format_timestamp(time.time_ns()).encode('utf-8'), b',',
+            _csv_field(campaign_id), b',', _csv_field(variant), b',',
+        ))
+        parts = []
+        for i in opened_idx:
+            head = prefix + _csv_field(recipients[i].get('email', ''))
+            parts.append(head + _OPEN_SUFFIX)
+            if i in clicked_idx:
+                parts.append(head + _CLICK_SUFFIX)
+        self._append(b''.join(parts))
+        logger.info("Logged %d activities", len(parts))